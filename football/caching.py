@@ -0,0 +1,64 @@
+import time
+from functools import wraps
+
+from django.core.cache import cache
+
+
+# Версии данных: при изменении (см. signals.py) версия меняется,
+# поэтому старые закэшированные значения просто перестают читаться.
+# Матчи — любые изменения матчей/событий/команд,
+# команды — только сами команды (списки выбора команды).
+MATCHES_VERSION_KEY = 'matches_ver'
+TEAMS_VERSION_KEY = 'teams_ver'
+
+
+def get_version(version_key):
+    return cache.get_or_set(version_key, time.time_ns, timeout=None)
+
+
+def bump_version(version_key):
+    # новая версия — просто новое значение, без чтения старого: в общем кэше
+    # (БД) incr не атомарен, и два одновременных сброса могли бы дать одну версию
+    cache.set(version_key, time.time_ns(), timeout=None)
+
+
+def bump_matches_version():
+    bump_version(MATCHES_VERSION_KEY)
+
+
+def bump_teams_version():
+    bump_version(TEAMS_VERSION_KEY)
+
+
+def cached_by_version(version_key, key, timeout=300):
+    """
+    Кэширует результат функции без аргументов до следующей смены версии
+    version_key или до истечения timeout.
+    Значение хранится вместе с версией, при которой оно посчитано, поэтому
+    версия и значение читаются из кэша одним запросом.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper():
+            cached = cache.get_many([version_key, key])
+            version = cached.get(version_key)
+            if version is None:
+                version = get_version(version_key)
+
+            entry = cached.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            result = func()
+            cache.set(key, (version, result), timeout)
+            return result
+        return wrapper
+    return decorator
+
+
+def cached_by_matches_version(key, timeout=300):
+    return cached_by_version(MATCHES_VERSION_KEY, key, timeout)
+
+
+def cached_by_teams_version(key, timeout=300):
+    return cached_by_version(TEAMS_VERSION_KEY, key, timeout)
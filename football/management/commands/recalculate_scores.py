@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from football.models import Match
+from football.scores import update_match_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённый счёт всех матчей по их событиям'
+
+    def handle(self, *args, **options):
+        matches = list(Match.objects.only('id', 'home_team_id', 'away_team_id'))
+        update_match_scores(matches)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитан счёт матчей: {len(matches)}'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'date'], name='матчи_статус_1ba854_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['match', 'team', 'event_type', 'minute', 'added_time'], name='события_мат_FK_id_м_fac4fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['team', 'player', 'event_type'], name='события_мат_FK_id_к_8cbeee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['player', 'event_type'], name='события_мат_FK_id_и_5c7c9a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchlineup',
+            index=models.Index(fields=['team', 'player', 'is_starting'], name='состав_на_м_FK_id_к_eaa47a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchlineup',
+            index=models.Index(fields=['match', 'team'], name='состав_на_м_FK_id_м_be0a9e_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:11
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_match_goals(apps, schema_editor):
+    """
+    Заполняет новый сохранённый счёт у существующих матчей по их событиям
+    (как scores.update_match_scores: автогол засчитывается сопернику).
+    """
+    Match = apps.get_model('football', 'Match')
+    MatchEvent = apps.get_model('football', 'MatchEvent')
+
+    matches = list(Match.objects.only('id', 'home_team_id', 'away_team_id'))
+    if not matches:
+        return
+
+    rows = (
+        MatchEvent.objects
+        .filter(event_type__in=['гол', 'пенальти_гол', 'автогол'])
+        .values('match_id', 'team_id', 'event_type')
+        .annotate(c=Count('id'))
+        .order_by()
+    )
+
+    normal = {}
+    own = {}
+    for row in rows:
+        key = (row['match_id'], row['team_id'])
+        target = own if row['event_type'] == 'автогол' else normal
+        target[key] = target.get(key, 0) + row['c']
+
+    for m in matches:
+        home_key = (m.id, m.home_team_id)
+        away_key = (m.id, m.away_team_id)
+        m.home_goals = normal.get(home_key, 0) + own.get(away_key, 0)
+        m.away_goals = normal.get(away_key, 0) + own.get(home_key, 0)
+    Match.objects.bulk_update(matches, ['home_goals', 'away_goals'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='away_goals',
+            field=models.IntegerField(blank=True, db_column='голы_гостей', default=0, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='home_goals',
+            field=models.IntegerField(blank=True, db_column='голы_хозяев', default=0, null=True),
+        ),
+        migrations.RunPython(fill_match_goals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0003_match_goals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['player', 'match'], name='события_мат_FK_id_и_5aaf4a_idx'),
+        ),
+    ]
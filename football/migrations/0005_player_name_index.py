@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0004_matchevent_player_match_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['last_name', 'first_name'], name='игроки_фамилия_7e6b4e_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0006_player_name_trgm_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['position', 'last_name', 'first_name'], name='игроки_позиция_ebac9b_idx'),
+        ),
+    ]
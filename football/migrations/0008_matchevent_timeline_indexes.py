@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-15 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football', '0007_player_position_name_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['match', 'minute', 'added_time', 'id'], name='события_мат_FK_id_м_0648cb_idx'),
+        ),
+    ]
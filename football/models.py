@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 
 # ТРЕНЕРЫ  (таблица: `тренеры`)
@@ -64,6 +66,18 @@ class Player(models.Model):
 
     class Meta:
         db_table = 'игроки'
+        indexes = [
+            models.Index(fields=['last_name', 'first_name']),
+            # фильтр по позиции сразу в порядке сортировки списка
+            models.Index(fields=['position', 'last_name', 'first_name']),
+            # поиск по имени/фамилии идёт через icontains → UPPER(...) LIKE '%...%',
+            # такой запрос может использовать только триграммный индекс (pg_trgm)
+            GinIndex(
+                OpClass(Upper('first_name'), name='gin_trgm_ops'),
+                OpClass(Upper('last_name'), name='gin_trgm_ops'),
+                name='игроки_имя_trgm_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -125,9 +139,27 @@ class Match(models.Model):
         default='запланирован',
         db_column='статус',
     )
+    # счёт хранится денормализованно и пересчитывается по событиям (signals.py);
+    # у нового матча событий ещё нет, поэтому он создаётся сразу со счётом 0:0
+    home_goals = models.IntegerField(default=0, null=True, blank=True, db_column='голы_хозяев')
+    away_goals = models.IntegerField(default=0, null=True, blank=True, db_column='голы_гостей')
 
     class Meta:
         db_table = 'матчи'
+        indexes = [
+            models.Index(fields=['status', 'date']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # команды на момент загрузки: счёт пересчитывается при сохранении,
+        # только если они сменились (signals.py)
+        instance._loaded_teams = (
+            instance.__dict__.get('home_team_id'),
+            instance.__dict__.get('away_team_id'),
+        )
+        return instance
 
     def __str__(self):
         return f"{self.home_team} – {self.away_team} ({self.date:%d.%m.%Y})"
@@ -165,6 +197,10 @@ class MatchLineup(models.Model):
     class Meta:
         db_table = 'состав_на_матч'
         unique_together = (('match', 'player'),)
+        indexes = [
+            models.Index(fields=['team', 'player', 'is_starting']),
+            models.Index(fields=['match', 'team']),
+        ]
 
     def __str__(self):
         return f"{self.match} – {self.player} ({'старт' if self.is_starting else 'запас'})"
@@ -213,6 +249,15 @@ class MatchEvent(models.Model):
 
     class Meta:
         db_table = 'события_матча'
+        indexes = [
+            # хронология матча: фильтр по матчу уже в порядке (минута, доб. время, id)
+            models.Index(fields=['match', 'minute', 'added_time', 'id']),
+            # парные события (гол + ассист, замена) одного момента команды
+            models.Index(fields=['match', 'team', 'event_type', 'minute', 'added_time']),
+            models.Index(fields=['team', 'player', 'event_type']),
+            models.Index(fields=['player', 'event_type']),
+            models.Index(fields=['player', 'match']),
+        ]
 
     def __str__(self):
         if self.added_time:
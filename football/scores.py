@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .caching import bump_matches_version
+from .models import Match, MatchEvent
+
+
+SCORING_EVENT_TYPES = ['гол', 'пенальти_гол', 'автогол']
+
+
+def get_match_scores(matches):
+    """
+    Возвращает {match_id: (home_goals, away_goals)} для списка матчей
+    одним агрегирующим запросом по событиям.
+    Учитываются:
+      - 'гол'
+      - 'пенальти_гол'
+      - 'автогол' (в пользу соперника)
+    """
+    scoring_types = ['гол', 'пенальти_гол']
+    own_goal_type = 'автогол'
+
+    matches = list(matches)
+    if not matches:
+        return {}
+
+    rows = (
+        MatchEvent.objects
+        .filter(
+            match_id__in=[m.id for m in matches],
+            event_type__in=scoring_types + [own_goal_type],
+        )
+        .values('match_id', 'team_id', 'event_type')
+        .annotate(c=Count('id'))
+    )
+
+    normal = {}
+    own = {}
+    for row in rows:
+        key = (row['match_id'], row['team_id'])
+        if row['event_type'] == own_goal_type:
+            own[key] = own.get(key, 0) + row['c']
+        else:
+            normal[key] = normal.get(key, 0) + row['c']
+
+    scores = {}
+    for m in matches:
+        home_key = (m.id, m.home_team_id)
+        away_key = (m.id, m.away_team_id)
+        scores[m.id] = (
+            normal.get(home_key, 0) + own.get(away_key, 0),
+            normal.get(away_key, 0) + own.get(home_key, 0),
+        )
+    return scores
+
+
+def update_match_scores(matches):
+    """
+    Пересчитывает сохранённый счёт (home_goals / away_goals) у матчей
+    по их событиям и записывает его одним UPDATE.
+    Версия кэша матчей меняется после записи счёта, при коммите транзакции.
+    """
+    matches = list(matches)
+    if not matches:
+        return
+
+    scores = get_match_scores(matches)
+    for m in matches:
+        m.home_goals, m.away_goals = scores[m.id]
+    Match.objects.bulk_update(matches, ['home_goals', 'away_goals'])
+    transaction.on_commit(bump_matches_version)
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import bump_matches_version, bump_teams_version
+from .models import Team, Match, MatchEvent
+from .scores import SCORING_EVENT_TYPES, update_match_scores
+
+
+# Версия кэша меняется только после коммита: иначе параллельный запрос может
+# успеть пересобрать таблицу по старым данным и положить её под новую версию.
+
+
+def deleted_with(kwargs, *models):
+    """Удаление пришло каскадом от объекта (или queryset) одной из моделей."""
+    origin = kwargs.get('origin')
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def invalidate_teams_cache(sender, **kwargs):
+    # название/эмблема команды есть и в списках выбора, и в таблице/шапке
+    transaction.on_commit(bump_teams_version)
+    transaction.on_commit(bump_matches_version)
+
+
+@receiver(post_delete, sender=Match)
+def invalidate_matches_cache(sender, **kwargs):
+    if deleted_with(kwargs, Team):
+        # кэш сбросит удаление самой команды
+        return
+    transaction.on_commit(bump_matches_version)
+
+
+@receiver(post_save, sender=Match)
+def update_score_on_match_save(sender, instance, created, **kwargs):
+    teams = (instance.home_team_id, instance.away_team_id)
+    if created or getattr(instance, '_loaded_teams', None) == teams:
+        # у нового матча событий нет (счёт 0:0 по умолчанию), а при тех же
+        # командах счёт не меняется — пересчитывать нечего, только сброс кэша
+        transaction.on_commit(bump_matches_version)
+    else:
+        # при смене команд хозяев/гостей счёт по тем же событиям меняется;
+        # кэш сбрасывается уже после записи счёта (см. update_match_scores)
+        update_match_scores([instance])
+    instance._loaded_teams = teams
+
+
+@receiver(post_save, sender=MatchEvent)
+@receiver(post_delete, sender=MatchEvent)
+def update_score_on_event_change(sender, instance, **kwargs):
+    if deleted_with(kwargs, Match, Team):
+        # матч удаляется целиком — пересчитывать его счёт незачем
+        return
+    if instance.event_type not in SCORING_EVENT_TYPES:
+        transaction.on_commit(bump_matches_version)
+        return
+    update_match_scores(Match.objects.filter(pk=instance.match_id))
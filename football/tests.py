@@ -1,3 +1,397 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Team, Player, TeamPlayer, Match, MatchLineup, MatchEvent
+from .caching import TEAMS_VERSION_KEY
+from .views import _calculate_standings, get_teams_for_choice
+
+
+# Страницы рендерятся без collectstatic и без редиректа на https,
+# даже если тесты запущены с DEBUG=0
+VIEW_TEST_SETTINGS = override_settings(
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    SECURE_SSL_REDIRECT=False,
+)
+
+
+def make_match(home, away, status='завершён', day=1):
+    return Match.objects.create(
+        home_team=home,
+        away_team=away,
+        date=timezone.make_aware(datetime.datetime(2024, 5, day, 18, 0)),
+        status=status,
+    )
+
+
+def add_event(match, team, event_type, minute, added_time=None, player=None):
+    return MatchEvent.objects.create(
+        match=match,
+        team=team,
+        player=player,
+        event_type=event_type,
+        minute=minute,
+        added_time=added_time,
+    )
+
+
+class MatchScoreSyncTests(TestCase):
+    """Сохранённый счёт матча пересчитывается сигналами при изменении событий."""
+
+    def setUp(self):
+        self.home = Team.objects.create(name='Хозяева')
+        self.away = Team.objects.create(name='Гости')
+        self.match = make_match(self.home, self.away)
+
+    def assertScore(self, home_goals, away_goals):
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.home_goals, self.match.away_goals), (home_goals, away_goals))
+
+    def test_new_match_has_zero_score(self):
+        self.assertScore(0, 0)
+
+    def test_score_follows_created_and_deleted_events(self):
+        goal = add_event(self.match, self.home, 'гол', 10)
+        self.assertScore(1, 0)
+
+        # автогол игрока гостей идёт в пользу хозяев
+        own_goal = add_event(self.match, self.away, 'автогол', 20)
+        self.assertScore(2, 0)
+
+        add_event(self.match, self.away, 'пенальти_гол', 30)
+        self.assertScore(2, 1)
+
+        add_event(self.match, self.home, 'ассист', 10)
+        add_event(self.match, self.away, 'желтая', 40)
+        add_event(self.match, self.home, 'замена', 60)
+        self.assertScore(2, 1)
+
+        goal.delete()
+        self.assertScore(1, 1)
+
+        own_goal.delete()
+        self.assertScore(0, 1)
+
+    def test_swapping_teams_recalculates_score(self):
+        add_event(self.match, self.home, 'гол', 10)
+        self.assertScore(1, 0)
+
+        self.match.home_team, self.match.away_team = self.away, self.home
+        self.match.save()
+        self.assertScore(0, 1)
+
+    def test_match_delete_does_not_recalculate_cascaded_events(self):
+        for minute in range(1, 6):
+            add_event(self.match, self.home, 'гол', minute)
+            add_event(self.match, self.away, 'желтая', minute)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.match.delete()
+
+        # одна смена версии от самого матча, события его счёт не трогают
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(MatchEvent.objects.exists())
+
+
+class StandingsTests(TestCase):
+    """Турнирная таблица по завершённым матчам против посчитанной вручную."""
+
+    def setUp(self):
+        cache.clear()
+        self.a = Team.objects.create(name='A')
+        self.b = Team.objects.create(name='B')
+        self.c = Team.objects.create(name='C')
+        self.d = Team.objects.create(name='D')
+
+        # A – B 2:1
+        ab = make_match(self.a, self.b, day=1)
+        add_event(ab, self.a, 'гол', 10)
+        add_event(ab, self.a, 'пенальти_гол', 20)
+        add_event(ab, self.b, 'гол', 30)
+
+        # B – C 0:0
+        make_match(self.b, self.c, day=2)
+
+        # C – A 1:1, гол A — автогол игрока C
+        ca = make_match(self.c, self.a, day=3)
+        add_event(ca, self.c, 'гол', 15)
+        add_event(ca, self.c, 'автогол', 70)
+
+        # незавершённые матчи в таблицу не попадают
+        live = make_match(self.a, self.d, status='идёт', day=4)
+        add_event(live, self.d, 'гол', 5)
+        make_match(self.d, self.a, status='запланирован', day=5)
+
+    def test_table_matches_hand_computed_fixture(self):
+        table, by_team = _calculate_standings()
+
+        self.assertEqual([row['team'].name for row in table], ['A', 'C', 'B', 'D'])
+
+        def summary(team):
+            row = by_team[team.id]
+            return (
+                row['games'], row['wins'], row['draws'], row['losses'],
+                row['goals_for'], row['goals_against'], row['points'],
+            )
+
+        self.assertEqual(summary(self.a), (2, 1, 1, 0, 3, 2, 4))
+        self.assertEqual(summary(self.b), (2, 0, 1, 1, 1, 2, 1))
+        self.assertEqual(summary(self.c), (2, 0, 2, 0, 1, 1, 2))
+        self.assertEqual(summary(self.d), (0, 0, 0, 0, 0, 0, 0))
+
+
+class StandingsCacheTests(TestCase):
+    """Закэшированная таблица обновляется только после коммита изменений."""
+
+    def setUp(self):
+        cache.clear()
+        self.home = Team.objects.create(name='Хозяева')
+        self.away = Team.objects.create(name='Гости')
+
+    def test_cached_table_is_refreshed_after_commit(self):
+        _calculate_standings()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            match = make_match(self.home, self.away)
+            add_event(match, self.home, 'гол', 10)
+
+        # до коммита версия кэша не меняется — отдаётся прежняя таблица
+        _, by_team = _calculate_standings()
+        self.assertEqual(by_team[self.home.id]['points'], 0)
+        self.assertTrue(callbacks)
+
+        for callback in callbacks:
+            callback()
+
+        _, by_team = _calculate_standings()
+        self.assertEqual(by_team[self.home.id]['points'], 3)
+        self.assertEqual(by_team[self.away.id]['losses'], 1)
+
+
+class TeamChoicesCacheTests(TestCase):
+    """Список команд для выбора сбрасывается изменениями команд, но не событиями матчей."""
+
+    def setUp(self):
+        cache.clear()
+        self.home = Team.objects.create(name='Хозяева')
+        self.away = Team.objects.create(name='Гости')
+
+    def team_names(self):
+        return [t['name'] for t in get_teams_for_choice()]
+
+    def test_new_team_appears_after_commit(self):
+        self.assertEqual(self.team_names(), ['Гости', 'Хозяева'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.objects.create(name='Новая')
+
+        self.assertEqual(self.team_names(), ['Гости', 'Новая', 'Хозяева'])
+
+    def test_match_events_keep_teams_version(self):
+        get_teams_for_choice()
+        version = cache.get(TEAMS_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            match = make_match(self.home, self.away)
+            add_event(match, self.home, 'гол', 10)
+            add_event(match, self.away, 'желтая', 20)
+
+        self.assertEqual(cache.get(TEAMS_VERSION_KEY), version)
+
+
+@VIEW_TEST_SETTINGS
+class PlayerEditTeamTests(TestCase):
+    """Смена команды игрока, который числится сразу в нескольких командах."""
+
+    def setUp(self):
+        cache.clear()
+        self.a = Team.objects.create(name='A')
+        self.b = Team.objects.create(name='B')
+        self.c = Team.objects.create(name='C')
+        self.player = Player.objects.create(first_name='И', last_name='Игрок', position='НАП')
+        TeamPlayer.objects.create(team=self.a, player=self.player, number=9)
+        TeamPlayer.objects.create(team=self.b, player=self.player, number=10)
+
+    def save_team(self, team_id):
+        return self.client.post(
+            reverse('player_edit', args=[self.player.id]),
+            {'save_team': '1', 'new_team_id': team_id},
+        )
+
+    def player_teams(self):
+        return list(
+            TeamPlayer.objects.filter(player=self.player).values_list('team_id', 'number')
+        )
+
+    def test_move_to_new_team(self):
+        response = self.save_team(str(self.c.id))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.player_teams(), [(self.c.id, None)])
+
+    def test_keep_one_of_current_teams(self):
+        response = self.save_team(str(self.b.id))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.player_teams(), [(self.b.id, None)])
+
+    def test_remove_from_all_teams(self):
+        self.save_team('')
+
+        self.assertEqual(self.player_teams(), [])
+
+
+class MatchEventsTestMixin:
+    """Матч с заявками обеих команд для проверки событий на страницах матча."""
+
+    def setUp(self):
+        cache.clear()
+        self.home = Team.objects.create(name='Хозяева')
+        self.away = Team.objects.create(name='Гости')
+        self.match = make_match(self.home, self.away, status='идёт')
+
+        self.hp = [
+            Player.objects.create(first_name=f'Х{i}', last_name=f'Хозяин{i}', position='ПЗ')
+            for i in range(10)
+        ]
+        self.ap = [
+            Player.objects.create(first_name=f'Г{i}', last_name=f'Гость{i}', position='ПЗ')
+            for i in range(3)
+        ]
+        MatchLineup.objects.bulk_create(
+            [
+                MatchLineup(match=self.match, team=self.home, player=p, is_starting=i < 7)
+                for i, p in enumerate(self.hp)
+            ] + [
+                MatchLineup(match=self.match, team=self.away, player=p, is_starting=True)
+                for p in self.ap
+            ]
+        )
+
+    def home_event(self, event_type, minute, player_index, added_time=None):
+        return add_event(
+            self.match, self.home, event_type, minute, added_time, self.hp[player_index]
+        )
+
+
+@VIEW_TEST_SETTINGS
+class MatchDetailEventsTests(MatchEventsTestMixin, TestCase):
+    """Связывание гол + ассист и двух записей замены на странице матча."""
+
+    def test_goal_and_substitution_pairing(self):
+        # 10': гол, ассист, гол, ассист, пенальти без ассиста
+        self.home_event('гол', 10, 0)
+        self.home_event('ассист', 10, 1)
+        self.home_event('гол', 10, 2)
+        self.home_event('ассист', 10, 3)
+        self.home_event('пенальти_гол', 10, 4)
+        # у гостей в ту же минуту свой гол с ассистом — к хозяевам не относится
+        add_event(self.match, self.away, 'гол', 10, player=self.ap[0])
+        add_event(self.match, self.away, 'ассист', 10, player=self.ap[1])
+
+        # 20': оба гола записаны раньше ассистов
+        self.home_event('гол', 20, 0)
+        self.home_event('гол', 20, 2)
+        self.home_event('ассист', 20, 1)
+        self.home_event('ассист', 20, 3)
+
+        # 45+1' гол, ассист в другое добавленное время с ним не связывается
+        self.home_event('гол', 45, 4, added_time=1)
+        self.home_event('ассист', 45, 1, added_time=2)
+
+        # 60': две замены в одну минуту
+        self.home_event('замена', 60, 5)
+        self.home_event('замена', 60, 7)
+        self.home_event('замена', 60, 6)
+        self.home_event('замена', 60, 8)
+
+        response = self.client.get(reverse('match_detail', args=[self.match.id]))
+        self.assertEqual(response.status_code, 200)
+
+        def describe(item):
+            if item['kind'] == 'sub':
+                return ('sub', item['minute'], item['added'],
+                        item['player_out'].id, item['player_in'] and item['player_in'].id)
+            return ('goal', item['minute'], item['added'], item['player'].id,
+                    item['is_penalty'], item['assist'] and item['assist'].id)
+
+        hp = [p.id for p in self.hp]
+        self.assertEqual(
+            [describe(item) for item in response.context['home_events_display']],
+            [
+                ('goal', 10, None, hp[0], False, hp[1]),
+                ('goal', 10, None, hp[2], False, hp[3]),
+                ('goal', 10, None, hp[4], True, None),
+                ('goal', 20, None, hp[0], False, hp[1]),
+                ('goal', 20, None, hp[2], False, hp[3]),
+                ('goal', 45, 1, hp[4], False, None),
+                ('sub', 60, None, hp[5], hp[7]),
+                ('sub', 60, None, hp[6], hp[8]),
+            ],
+        )
+        self.assertEqual(
+            [describe(item) for item in response.context['away_events_display']],
+            [('goal', 10, None, self.ap[0].id, False, self.ap[1].id)],
+        )
+
+
+@VIEW_TEST_SETTINGS
+class DeleteEventsTests(MatchEventsTestMixin, TestCase):
+    """Удаление события вместе с парными событиями того же момента той же команды."""
+
+    def delete_events(self, *events):
+        response = self.client.post(
+            reverse('match_events_edit', args=[self.match.id]),
+            {'delete_events': '1', 'event_id': [str(e.id) for e in events]},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def remaining(self):
+        return set(MatchEvent.objects.filter(match=self.match).values_list('id', flat=True))
+
+    def test_goal_takes_its_assist(self):
+        goal = self.home_event('гол', 10, 0)
+        self.home_event('ассист', 10, 1)
+        card = self.home_event('желтая', 10, 2)
+        other_goal = self.home_event('гол', 11, 3)
+        away_assist = add_event(self.match, self.away, 'ассист', 10, player=self.ap[0])
+
+        self.delete_events(goal)
+
+        self.assertEqual(self.remaining(), {card.id, other_goal.id, away_assist.id})
+
+    def test_assist_takes_its_goal(self):
+        self.home_event('пенальти_гол', 30, 0, added_time=2)
+        assist = self.home_event('ассист', 30, 1, added_time=2)
+        other = self.home_event('гол', 30, 2)
+
+        self.delete_events(assist)
+
+        self.assertEqual(self.remaining(), {other.id})
+
+    def test_substitution_records_are_deleted_together(self):
+        sub_out = self.home_event('замена', 60, 5)
+        self.home_event('замена', 60, 7)
+        later_out = self.home_event('замена', 70, 6)
+        later_in = self.home_event('замена', 70, 8)
+
+        self.delete_events(sub_out)
+
+        self.assertEqual(self.remaining(), {later_out.id, later_in.id})
+
+    def test_non_numeric_ids_are_ignored(self):
+        card = self.home_event('желтая', 10, 0)
+
+        response = self.client.post(
+            reverse('match_events_edit', args=[self.match.id]),
+            {'delete_events': '1', 'event_id': ['x', '']},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.remaining(), {card.id})
@@ -1,61 +1,59 @@
+import csv
+import heapq
+from collections import defaultdict, deque
 from itertools import groupby
 
 from django import forms
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Q, Min
+from django.core.paginator import Paginator
+from django.db.models import (
+    Count, Sum, F, Q, Exists, OuterRef, Prefetch, Subquery, Case, When, Value, IntegerField,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Coalesce
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
-from django.db import connection
-from django.http import HttpResponse
-import io
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
 
+from .caching import bump_matches_version, cached_by_matches_version, cached_by_teams_version
 from .models import Team, Player, TeamPlayer, Match, MatchLineup, MatchEvent
 
 
-# ============================================================
-#                    ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
-# ============================================================
+# Статусы, для которых у матча показывается счёт
+SCORED_STATUSES = frozenset(('завершён', 'идёт'))
 
-def get_match_score(match):
-    """
-    Возвращает (home_goals, away_goals) по событиям матча.
-    Учитываются:
-      - 'гол'
-      - 'пенальти_гол'
-      - 'автогол' (в пользу соперника)
-    """
-    scoring_types = ['гол', 'пенальти_гол']
-    own_goal_type = 'автогол'
+# Подписи статусов для выгрузок (без get_status_display() на каждую строку)
+MATCH_STATUS_DISPLAY = dict(Match.STATUS_CHOICES)
 
-    events = MatchEvent.objects.filter(match=match)
+# Порядок позиций в составах: вратари, защитники, полузащитники, нападающие
+POSITION_RANK = {'ВРТ': 1, 'ЗАЩ': 2, 'ПЗ': 3, 'НАП': 4}
 
-    home_goals_normal = events.filter(
-        team=match.home_team,
-        event_type__in=scoring_types,
-    ).count()
-    away_goals_normal = events.filter(
-        team=match.away_team,
-        event_type__in=scoring_types,
-    ).count()
+# Базовый queryset и агрегаты списка игроков собираются один раз при импорте,
+# в запросе берётся дешёвая копия через .all()
+PLAYER_LIST_BASE = Player.objects.only('first_name', 'last_name', 'position')
 
-    home_from_own = events.filter(
-        team=match.away_team,
-        event_type=own_goal_type,
-    ).count()
-    away_from_own = events.filter(
-        team=match.home_team,
-        event_type=own_goal_type,
-    ).count()
+PLAYER_STATS_AGGREGATES = {
+    'goals': Count('id', filter=Q(event_type__in=['гол', 'пенальти_гол'])),
+    'assists': Count('id', filter=Q(event_type='ассист')),
+    'yellow_cards': Count('id', filter=Q(event_type='желтая')),
+    'red_cards': Count('id', filter=Q(event_type='красная')),
+    'matches': Count('match', distinct=True),
+}
 
-    return home_goals_normal + home_from_own, away_goals_normal + away_from_own
 
+# ============================================================
+#                    ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
+# ============================================================
 
+@cached_by_matches_version('header_matches', timeout=60)
 def get_header_matches():
     """
     Матчи для горизонтального блока под шапкой:
     - несколько последних завершённых
     - несколько ближайших (идёт / запланирован)
     Для завершённых / идущих считаем счёт по событиям матча.
+    Набор матчей зависит от текущего времени, поэтому кэш короткий.
     """
     now = timezone.now()
 
@@ -85,9 +83,7 @@ def get_header_matches():
     matches += list(future_qs)
 
     for m in matches:
-        if m.status in ['завершён', 'идёт']:
-            m.home_goals, m.away_goals = get_match_score(m)
-        else:
+        if m.status not in SCORED_STATUSES:
             m.home_goals = None
             m.away_goals = None
 
@@ -96,29 +92,79 @@ def get_header_matches():
 
 def sort_team_players_by_position(team_players):
     """
-    team_players: queryset/teamplayers list, где есть tp.player.position
-    Сортируем: GK -> DEF -> MID -> FWD, а внутри группы по фамилии/имени.
+    team_players: queryset TeamPlayer
+    Сортируем в БД: GK -> DEF -> MID -> FWD, а внутри группы по фамилии/имени.
     """
-    pos_rank = {
-        'ВРТ': 0, 'Вратарь': 0,
-        'ЗАЩ': 1, 'Защитник': 1,
-        'ПЗ': 2, 'Полузащитник': 2,
-        'НАП': 3, 'Нападающий': 3,
+    pos_rank = Case(
+        When(player__position='ВРТ', then=Value(0)),
+        When(player__position='ЗАЩ', then=Value(1)),
+        When(player__position='ПЗ', then=Value(2)),
+        When(player__position='НАП', then=Value(3)),
+        default=Value(99),  # неизвестные в конец
+        output_field=IntegerField(),
+    )
+    return (
+        team_players
+        .annotate(pos_rank=pos_rank)
+        .order_by('pos_rank', 'player__last_name', 'player__first_name')
+    )
+
+
+@cached_by_teams_version('teams_for_choice')
+def get_teams_for_choice():
+    """Команды (id, название, город, эмблема) для фильтров и форм выбора команды."""
+    return list(Team.objects.order_by('name').values('id', 'name', 'city', 'emblem'))
+
+
+def player_stats_annotations(*names):
+    """
+    Статистика игрока (PLAYER_STATS_AGGREGATES, по умолчанию вся) коррелированными
+    подзапросами только по его событиям, без JOIN, который размножал бы строки.
+    """
+    player_events = MatchEvent.objects.filter(player=OuterRef('pk')).values('player')
+    return {
+        name: Coalesce(Subquery(player_events.annotate(v=aggregate).values('v')), 0)
+        for name, aggregate in PLAYER_STATS_AGGREGATES.items()
+        if not names or name in names
     }
 
-    def key(tp):
-        p = tp.player
-        pos = (p.position or '').upper()
-        rank = pos_rank.get(pos, 99)  # неизвестные в конец
-        last = (p.last_name or '')
-        first = (p.first_name or '')
-        return (rank, last, first)
 
-    return sorted(team_players, key=key)
+def main_team_name_subquery():
+    """Название команды игрока (первой по алфавиту, если их несколько)."""
+    return Subquery(
+        TeamPlayer.objects
+        .filter(player=OuterRef('pk'))
+        .order_by('team__name')
+        .values('team__name')[:1]
+    )
+
+
+def int_or_none(val):
+    """Целое из строки параметра или None, если это не число."""
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return None
+
 
+def get_post_ids(request, name):
+    """Множество целых id из request.POST.getlist(name); нечисловые значения пропускаются."""
+    return {int(v) for v in request.POST.getlist(name) if v.strip().isdecimal()}
 
+
+def get_players_without_team():
+    """Игроки, которые не состоят ни в одной команде (NOT EXISTS вместо JOIN)."""
+    return Player.objects.filter(
+        ~Exists(TeamPlayer.objects.filter(player=OuterRef('pk')))
+    )
+
+
+@cached_by_matches_version('standings')
 def _calculate_standings():
-    """Считаем турнирную таблицу по завершённым матчам и голевым событиям (учитываем автоголы)."""
+    """
+    Считаем турнирную таблицу по завершённым матчам и сохранённому в них счёту (с учётом автоголов).
+    Возвращает (отсортированная таблица, {team_id: строка таблицы}).
+    """
     teams = Team.objects.all()
     stats = {
         t.id: {
@@ -134,36 +180,39 @@ def _calculate_standings():
         for t in teams
     }
 
-    finished_matches = Match.objects.filter(status='завершён')
-
-    for m in finished_matches:
-        home_goals, away_goals = get_match_score(m)
-
-        hs = stats[m.home_team_id]
-        gs = stats[m.away_team_id]
-
-        hs['games'] += 1
-        gs['games'] += 1
-
-        hs['goals_for'] += home_goals
-        hs['goals_against'] += away_goals
-
-        gs['goals_for'] += away_goals
-        gs['goals_against'] += home_goals
-
-        if home_goals > away_goals:
-            hs['wins'] += 1
-            hs['points'] += 3
-            gs['losses'] += 1
-        elif home_goals < away_goals:
-            gs['wins'] += 1
-            gs['points'] += 3
-            hs['losses'] += 1
-        else:
-            hs['draws'] += 1
-            gs['draws'] += 1
-            hs['points'] += 1
-            gs['points'] += 1
+    # по одной группировке на сторону (дома / в гостях): победы, ничьи и голы
+    # считает СУБД, в Python остаётся сложить не больше двух строк на команду
+    finished_matches = (
+        Match.objects
+        .filter(status='завершён')
+        .alias(hg=Coalesce('home_goals', 0), ag=Coalesce('away_goals', 0))
+    )
+    for own, goals_for, goals_against in (
+        ('home_team_id', 'hg', 'ag'),
+        ('away_team_id', 'ag', 'hg'),
+    ):
+        rows = (
+            finished_matches
+            .values(own)
+            .annotate(
+                games=Count('id'),
+                wins=Count('id', filter=Q(**{f'{goals_for}__gt': F(goals_against)})),
+                draws=Count('id', filter=Q(hg=F('ag'))),
+                scored=Sum(goals_for),
+                conceded=Sum(goals_against),
+            )
+            .order_by()
+        )
+        for r in rows:
+            row = stats[r[own]]
+            losses = r['games'] - r['wins'] - r['draws']
+            row['games'] += r['games']
+            row['wins'] += r['wins']
+            row['draws'] += r['draws']
+            row['losses'] += losses
+            row['goals_for'] += r['scored']
+            row['goals_against'] += r['conceded']
+            row['points'] += 3 * r['wins'] + r['draws']
 
     table = sorted(
         stats.values(),
@@ -173,14 +222,7 @@ def _calculate_standings():
             -r['goals_for'],
         ),
     )
-    return table
-
-
-def _get_team_row_from_table(team, standings):
-    for row in standings:
-        if row['team'].id == team.id:
-            return row
-    return None
+    return table, stats
 
 
 # ============================================================
@@ -225,7 +267,7 @@ class MatchForm(forms.ModelForm):
 
 def index(request):
     header_matches = get_header_matches()
-    standings = _calculate_standings()
+    standings, _ = _calculate_standings()
 
     scoring_types = ['гол', 'пенальти_гол']
 
@@ -252,28 +294,38 @@ def index(request):
         )
     )
 
-    top_scorers = (
-        base_qs
-        .filter(goals__gt=0)
-        .order_by('-goals', '-assists', 'last_name', 'first_name')[:5]
+    # одна выборка на все четыре топа, дальше top-5 через кучу в Python
+    players = list(
+        base_qs.filter(
+            Q(goals__gt=0) |
+            Q(assists__gt=0) |
+            Q(yellow_cards__gt=0) |
+            Q(red_cards__gt=0)
+        )
     )
 
-    top_assists = (
-        base_qs
-        .filter(assists__gt=0)
-        .order_by('-assists', '-goals', 'last_name', 'first_name')[:5]
+    top_scorers = heapq.nsmallest(
+        5,
+        (p for p in players if p.goals > 0),
+        key=lambda p: (-p.goals, -p.assists, p.last_name, p.first_name),
     )
 
-    top_yellow = (
-        base_qs
-        .filter(yellow_cards__gt=0)
-        .order_by('-yellow_cards', 'last_name', 'first_name')[:5]
+    top_assists = heapq.nsmallest(
+        5,
+        (p for p in players if p.assists > 0),
+        key=lambda p: (-p.assists, -p.goals, p.last_name, p.first_name),
     )
 
-    top_red = (
-        base_qs
-        .filter(red_cards__gt=0)
-        .order_by('-red_cards', 'last_name', 'first_name')[:5]
+    top_yellow = heapq.nsmallest(
+        5,
+        (p for p in players if p.yellow_cards > 0),
+        key=lambda p: (-p.yellow_cards, p.last_name, p.first_name),
+    )
+
+    top_red = heapq.nsmallest(
+        5,
+        (p for p in players if p.red_cards > 0),
+        key=lambda p: (-p.red_cards, p.last_name, p.first_name),
     )
 
     context = {
@@ -298,7 +350,7 @@ def team_list(request):
     sort = request.GET.get('sort', 'name')
     order = request.GET.get('order', 'asc')
 
-    teams = Team.objects.all()
+    teams = Team.objects.select_related('coach')
 
     if search:
         teams = teams.filter(
@@ -312,7 +364,7 @@ def team_list(request):
     if order == 'desc':
         sort = '-' + sort
 
-    teams = teams.order_by(sort)
+    teams = Paginator(teams.order_by(sort), 25).get_page(request.GET.get('page'))
 
     context = {
         'header_matches': header_matches,
@@ -326,95 +378,99 @@ def team_list(request):
 
 def team_detail(request, team_id):
     header_matches = get_header_matches()
-    team = get_object_or_404(Team, pk=team_id)
-
-    standings = _calculate_standings()
-    team_row = _get_team_row_from_table(team, standings)
+    team = get_object_or_404(Team.objects.select_related('coach'), pk=team_id)
 
-    squad_qs = (
-        TeamPlayer.objects
-        .filter(team=team)
-        .select_related('player')
-        .order_by('number', 'player__last_name')
-    )
+    standings, standings_by_team = _calculate_standings()
+    team_row = standings_by_team.get(team.id)
 
-    player_ids = [tp.player_id for tp in squad_qs]
     scoring_types = ['гол', 'пенальти_гол']
 
-    events_agg = (
-        MatchEvent.objects
-        .filter(team=team, player_id__in=player_ids)
-        .values('player_id')
-        .annotate(
-            goals=Count('id', filter=Q(event_type__in=scoring_types)),
-            assists=Count('id', filter=Q(event_type='ассист')),
-            yellow=Count('id', filter=Q(event_type='желтая')),
-            red=Count('id', filter=Q(event_type='красная')),
-        )
-    )
-
-    events_map = {
-        row['player_id']: {
-            'goals': row['goals'],
-            'assists': row['assists'],
-            'yellow': row['yellow'],
-            'red': row['red'],
-        }
-        for row in events_agg
-    }
-
-    starters_qs = (
+    # матчи, где игрок вышел в старте за эту команду;
+    # (матч, игрок) в составе уникальны, так что DISTINCT не нужен
+    starts_sq = (
         MatchLineup.objects
-        .filter(team=team, player_id__in=player_ids, is_starting=True)
-        .values('player_id', 'match_id')
-        .distinct()
+        .filter(team=team, player=OuterRef('player_id'), is_starting=True)
+        .values('player')
+        .annotate(c=Count('id'))
+        .values('c')
     )
-
-    subs_qs = (
+    # матчи, где игрок участвовал в замене, но не выходил в старте
+    sub_only_sq = (
         MatchEvent.objects
-        .filter(
-            team=team,
-            player_id__in=player_ids,
-            event_type='замена'
+        .filter(team=team, player=OuterRef('player_id'), event_type='замена')
+        .exclude(
+            Exists(
+                MatchLineup.objects.filter(
+                    team=team,
+                    match=OuterRef('match'),
+                    player=OuterRef('player'),
+                    is_starting=True,
+                )
+            )
         )
-        .values('player_id', 'match_id')
-        .distinct()
+        .values('player')
+        .annotate(c=Count('match', distinct=True))
+        .values('c')
     )
 
-    games_map = {pid: set() for pid in player_ids}
-
-    for row in starters_qs:
-        games_map.setdefault(row['player_id'], set()).add(row['match_id'])
-
-    for row in subs_qs:
-        games_map.setdefault(row['player_id'], set()).add(row['match_id'])
+    squad_qs = (
+        TeamPlayer.objects
+        .filter(team=team)
+        .select_related('player')
+        .only(
+            'number', 'team', 'player__first_name', 'player__last_name', 'player__position',
+        )
+        .annotate(
+            goals=Count('player__events', filter=Q(
+                player__events__team=team,
+                player__events__event_type__in=scoring_types,
+            )),
+            assists=Count('player__events', filter=Q(
+                player__events__team=team,
+                player__events__event_type='ассист',
+            )),
+            yellow=Count('player__events', filter=Q(
+                player__events__team=team,
+                player__events__event_type='желтая',
+            )),
+            red=Count('player__events', filter=Q(
+                player__events__team=team,
+                player__events__event_type='красная',
+            )),
+            games=(
+                Coalesce(Subquery(starts_sq), 0) +
+                Coalesce(Subquery(sub_only_sq), 0)
+            ),
+        )
+        .order_by('number', 'player__last_name')
+    )
 
     squad = []
     for tp in squad_qs:
-        pid = tp.player_id
-        ev = events_map.get(pid, {'goals': 0, 'assists': 0, 'yellow': 0, 'red': 0})
-        games = len(games_map.get(pid, set()))
         squad.append({
             'tp': tp,
             'number': tp.number,
-            'games': games,
-            'goals': ev['goals'],
-            'assists': ev['assists'],
-            'yellow': ev['yellow'],
-            'red': ev['red'],
+            'games': tp.games,
+            'goals': tp.goals,
+            'assists': tp.assists,
+            'yellow': tp.yellow,
+            'red': tp.red,
         })
 
-    matches = (
+    matches_qs = (
         Match.objects
         .filter(Q(home_team=team) | Q(away_team=team))
         .select_related('home_team', 'away_team')
+        .only(
+            'date', 'status', 'home_goals', 'away_goals',
+            'home_team__name', 'away_team__name',
+        )
         .order_by('-date')
     )
+    matches = Paginator(matches_qs, 25).get_page(request.GET.get('page'))
 
     for m in matches:
-        if m.status in ['завершён', 'идёт']:
-            m.home_goals, m.away_goals = get_match_score(m)
-        else:
+        if m.status not in SCORED_STATUSES:
             m.home_goals = None
             m.away_goals = None
 
@@ -480,99 +536,117 @@ def team_squad_edit(request, team_id):
     header_matches = get_header_matches()
     team = get_object_or_404(Team, pk=team_id)
 
-    squad_qs = TeamPlayer.objects.filter(team=team).select_related('player')
-    available_players = Player.objects.exclude(team_players__isnull=False).order_by('last_name')
+    squad_qs = (
+        TeamPlayer.objects
+        .filter(team=team)
+        .select_related('player')
+        .only('number', 'team', 'player__first_name', 'player__last_name', 'player__position')
+    )
+    available_players = (
+        get_players_without_team()
+        .only('first_name', 'last_name', 'position')
+        .order_by('last_name')
+    )
 
     if request.method == 'POST':
-        remove_ids = set(request.POST.getlist('remove_tp'))
+        with transaction.atomic():
+            # блокируем строки состава, чтобы параллельные правки не разошлись по номерам
+            locked_squad = TeamPlayer.objects.select_for_update().filter(team=team)
 
-        updates = []
-        for tp in squad_qs:
-            number_key = f'number_{tp.id}'
-            num_val = request.POST.get(number_key, '').strip()
+            remove_ids = set(request.POST.getlist('remove_tp'))
 
-            if str(tp.id) in remove_ids:
-                updates.append((tp, None, True))
-                continue
+            updates = []
+            for tp in locked_squad:
+                number_key = f'number_{tp.id}'
+                num_val = request.POST.get(number_key, '').strip()
 
-            if num_val == '':
-                new_num = None
-            else:
-                try:
-                    new_num = int(num_val)
-                except ValueError:
-                    new_num = None
-
-            updates.append((tp, new_num, False))
+                if str(tp.id) in remove_ids:
+                    updates.append((tp, None, True))
+                    continue
 
-        new_player_id = request.POST.get('new_player_id')
-        new_player_number_raw = request.POST.get('new_player_number', '').strip()
-        new_player_number = None
-        if new_player_number_raw:
-            try:
-                new_player_number = int(new_player_number_raw)
-            except ValueError:
-                new_player_number = None
-
-        used_numbers = set()
-        for tp, new_num, remove_flag in updates:
-            if remove_flag:
-                continue
-            if new_num is None:
-                continue
-            if new_num in used_numbers:
-                error_message = (
-                    f'В команде не может быть два игрока под номером {new_num}. '
-                    f'Исправь номера и попробуй снова.'
-                )
-                squad_qs = TeamPlayer.objects.filter(team=team).select_related('player')
-                available_players = Player.objects.exclude(team_players__isnull=False).order_by('last_name')
-                context = {
-                    'header_matches': header_matches,
-                    'team': team,
-                    'squad': squad_qs,
-                    'available_players': available_players,
-                    'error_message': error_message,
-                }
-                return render(request, 'team_squad_edit.html', context)
-            used_numbers.add(new_num)
-
-        if new_player_id and new_player_number is not None:
-            if new_player_number in used_numbers:
-                error_message = (
-                    f'Игрок с номером {new_player_number} уже есть в этой команде. '
-                    f'Выбери другой номер.'
-                )
-                squad_qs = TeamPlayer.objects.filter(team=team).select_related('player')
-                available_players = Player.objects.exclude(team_players__isnull=False).order_by('last_name')
-                context = {
-                    'header_matches': header_matches,
-                    'team': team,
-                    'squad': squad_qs,
-                    'available_players': available_players,
-                    'error_message': error_message,
-                }
-                return render(request, 'team_squad_edit.html', context)
+                if num_val == '':
+                    new_num = None
+                else:
+                    try:
+                        new_num = int(num_val)
+                    except ValueError:
+                        new_num = None
 
-        for tp, new_num, remove_flag in updates:
-            if remove_flag:
-                tp.delete()
-                continue
-            tp.number = new_num
-            tp.save()
+                updates.append((tp, new_num, False))
 
-        if new_player_id:
-            player = Player.objects.filter(pk=new_player_id).first()
-            if player and not TeamPlayer.objects.filter(player=player).exists():
-                tp = TeamPlayer(team=team, player=player)
-                if new_player_number is not None:
-                    tp.number = new_player_number
-                tp.save()
+            new_player_id = request.POST.get('new_player_id')
+            new_player_number_raw = request.POST.get('new_player_number', '').strip()
+            new_player_number = None
+            if new_player_number_raw:
+                try:
+                    new_player_number = int(new_player_number_raw)
+                except ValueError:
+                    new_player_number = None
 
-        return redirect('team_squad_edit', team_id=team.id)
+            used_numbers = set()
+            for tp, new_num, remove_flag in updates:
+                if remove_flag:
+                    continue
+                if new_num is None:
+                    continue
+                if new_num in used_numbers:
+                    error_message = (
+                        f'В команде не может быть два игрока под номером {new_num}. '
+                        f'Исправь номера и попробуй снова.'
+                    )
+                    context = {
+                        'header_matches': header_matches,
+                        'team': team,
+                        'squad': squad_qs,
+                        'available_players': available_players,
+                        'error_message': error_message,
+                    }
+                    return render(request, 'team_squad_edit.html', context)
+                used_numbers.add(new_num)
+
+            if new_player_id and new_player_number is not None:
+                if new_player_number in used_numbers:
+                    error_message = (
+                        f'Игрок с номером {new_player_number} уже есть в этой команде. '
+                        f'Выбери другой номер.'
+                    )
+                    context = {
+                        'header_matches': header_matches,
+                        'team': team,
+                        'squad': squad_qs,
+                        'available_players': available_players,
+                        'error_message': error_message,
+                    }
+                    return render(request, 'team_squad_edit.html', context)
+
+            remove_tp_ids = [tp.id for tp, new_num, remove_flag in updates if remove_flag]
+            if remove_tp_ids:
+                TeamPlayer.objects.filter(team=team, id__in=remove_tp_ids).delete()
+
+            changed = []
+            for tp, new_num, remove_flag in updates:
+                if remove_flag or tp.number == new_num:
+                    continue
+                tp.number = new_num
+                changed.append(tp)
+            if changed:
+                TeamPlayer.objects.bulk_update(changed, ['number'])
+
+            if new_player_id:
+                # игрок существует и ещё не состоит ни в одной команде — одним запросом
+                player = (
+                    get_players_without_team()
+                    .filter(pk=new_player_id)
+                    .only('id')
+                    .first()
+                )
+                if player:
+                    tp = TeamPlayer(team=team, player=player)
+                    if new_player_number is not None:
+                        tp.number = new_player_number
+                    tp.save()
 
-    squad_qs = TeamPlayer.objects.filter(team=team).select_related('player')
-    available_players = Player.objects.exclude(team_players__isnull=False).order_by('last_name')
+            return redirect('team_squad_edit', team_id=team.id)
 
     context = {
         'header_matches': header_matches,
@@ -617,7 +691,7 @@ def player_list(request):
     sort = request.GET.get('sort', 'last_name')
     order = request.GET.get('order', 'asc')
 
-    players = Player.objects.all()
+    players = PLAYER_LIST_BASE.all()
 
     if search:
         players = players.filter(
@@ -629,46 +703,21 @@ def player_list(request):
         players = players.filter(position=position)
 
     if team_id:
-        players = players.filter(team_players__team_id=team_id)
-
-    scoring_types = ['гол', 'пенальти_гол']
-    players = (
-        players
-        .annotate(
-            goals=Count('events', filter=Q(events__event_type__in=scoring_types)),
-            assists=Count('events', filter=Q(events__event_type='ассист')),
-            yellow_cards=Count('events', filter=Q(events__event_type='желтая')),
-            red_cards=Count('events', filter=Q(events__event_type='красная')),
-            matches=Count('events__match', distinct=True),
-            main_team_name=Min('team_players__team__name'),
+        players = players.filter(
+            Exists(TeamPlayer.objects.filter(player=OuterRef('pk'), team_id=team_id))
         )
-        .prefetch_related('team_players__team')
-    )
-
-    def int_or_none(val):
-        try:
-            return int(val)
-        except (TypeError, ValueError):
-            return None
 
-    g = int_or_none(min_goals)
-    if g is not None:
-        players = players.filter(goals__gte=g)
-
-    a = int_or_none(min_assists)
-    if a is not None:
-        players = players.filter(assists__gte=a)
-
-    y = int_or_none(min_yellow)
-    if y is not None:
-        players = players.filter(yellow_cards__gte=y)
-
-    r = int_or_none(min_red)
-    if r is not None:
-        players = players.filter(red_cards__gte=r)
-
-    if with_team == '1':
-        players = players.filter(team_players__isnull=False)
+    # все числовые фильтры собираем в один .filter()
+    stat_filters = {}
+    for raw, lookup in (
+        (min_goals, 'goals__gte'),
+        (min_assists, 'assists__gte'),
+        (min_yellow, 'yellow_cards__gte'),
+        (min_red, 'red_cards__gte'),
+    ):
+        value = int_or_none(raw)
+        if value is not None:
+            stat_filters[lookup] = value
 
     sort_map = {
         'last_name': 'last_name',
@@ -684,12 +733,60 @@ def player_list(request):
 
     sort_key = sort_map.get(sort, 'last_name')
 
+    # тяжёлые подзапросы нужны в основном запросе только для фильтра/сортировки
+    # по статистике или команде; иначе досчитываем их ниже для одной страницы
+    need_stats = bool(stat_filters) or sort_key in PLAYER_STATS_AGGREGATES
+    need_team_name = sort_key == 'main_team_name'
+
+    if need_stats:
+        players = players.annotate(**player_stats_annotations())
+
+    if need_team_name:
+        players = players.annotate(main_team_name=main_team_name_subquery())
+
+    if with_team == '1':
+        players = players.filter(Exists(TeamPlayer.objects.filter(player=OuterRef('pk'))))
+
+    if stat_filters:
+        players = players.filter(**stat_filters)
+
     if order == 'desc':
         sort_expr = '-' + sort_key
     else:
         sort_expr = sort_key
 
-    players = players.order_by(sort_expr, 'last_name', 'first_name')
+    players = players.order_by(sort_expr, 'last_name', 'first_name', 'id')
+    players = Paginator(players, 50).get_page(request.GET.get('page'))
+    players.object_list = list(players.object_list)
+    page_ids = [p.id for p in players.object_list]
+
+    if not need_stats and page_ids:
+        stats_by_player = {
+            row['player']: row
+            for row in (
+                MatchEvent.objects
+                .filter(player_id__in=page_ids)
+                .values('player')
+                .annotate(**PLAYER_STATS_AGGREGATES)
+                .order_by()
+            )
+        }
+        for p in players.object_list:
+            row = stats_by_player.get(p.id, {})
+            for name in PLAYER_STATS_AGGREGATES:
+                setattr(p, name, row.get(name, 0))
+
+    if not need_team_name and page_ids:
+        team_names = {}
+        for player_id, team_name in (
+            TeamPlayer.objects
+            .filter(player_id__in=page_ids)
+            .order_by('team__name')
+            .values_list('player_id', 'team__name')
+        ):
+            team_names.setdefault(player_id, team_name)
+        for p in players.object_list:
+            p.main_team_name = team_names.get(p.id)
 
     context = {
         'header_matches': header_matches,
@@ -705,7 +802,7 @@ def player_list(request):
         'min_red': min_red,
         'with_team': with_team,
         'positions': Player.POSITION_CHOICES,
-        'teams_filter': Team.objects.order_by('name'),
+        'teams_filter': get_teams_for_choice(),
     }
     return render(request, 'player_list.html', context)
 
@@ -721,63 +818,56 @@ def player_detail(request, player_id):
     scoring_types = ['гол', 'пенальти_гол']
     assist_type = 'ассист'
 
-    total_goals = MatchEvent.objects.filter(
-        player=player,
-        event_type__in=scoring_types,
-    ).count()
-
-    total_assists = MatchEvent.objects.filter(
-        player=player,
-        event_type=assist_type,
-    ).count()
-
-    total_yellow = MatchEvent.objects.filter(
-        player=player,
-        event_type='желтая',
-    ).count()
-
-    total_red = MatchEvent.objects.filter(
-        player=player,
-        event_type='красная',
-    ).count()
-
-    events = (
+    # статистика по матчам считается в БД: одна строка на матч
+    per_match_rows = (
         MatchEvent.objects
         .filter(player=player)
-        .select_related('match', 'team')
-        .order_by('match__date', 'minute', 'added_time')
+        .values('match_id', 'team_id')
+        .annotate(
+            goals=Count('id', filter=Q(event_type__in=scoring_types)),
+            assists=Count('id', filter=Q(event_type=assist_type)),
+            yellow=Count('id', filter=Q(event_type='желтая')),
+            red=Count('id', filter=Q(event_type='красная')),
+            is_starting=Exists(
+                MatchLineup.objects.filter(
+                    match=OuterRef('match_id'),
+                    player=player,
+                    is_starting=True,
+                )
+            ),
+        )
+        .order_by('match__date', 'match_id')
+    )
+    per_match_rows = list(per_match_rows)
+
+    matches_by_id = (
+        Match.objects
+        .select_related('home_team', 'away_team')
+        .in_bulk({row['match_id'] for row in per_match_rows})
     )
 
     per_match = {}
-    for e in events:
-        key = e.match_id
+    for row in per_match_rows:
+        key = row['match_id']
         if key not in per_match:
+            m = matches_by_id[key]
+            match_teams = {m.home_team_id: m.home_team, m.away_team_id: m.away_team}
             per_match[key] = {
-                'match': e.match,
-                'team': e.team,
+                'match': m,
+                'team': match_teams.get(row['team_id']),
                 'goals': 0,
                 'assists': 0,
                 'yellow': 0,
                 'red': 0,
-                'is_starting': False,
+                'is_starting': row['is_starting'],
             }
-        if e.event_type in scoring_types:
-            per_match[key]['goals'] += 1
-        elif e.event_type == assist_type:
-            per_match[key]['assists'] += 1
-        elif e.event_type == 'желтая':
-            per_match[key]['yellow'] += 1
-        elif e.event_type == 'красная':
-            per_match[key]['red'] += 1
-
-    if per_match:
-        lineups = (
-            MatchLineup.objects
-            .filter(match_id__in=per_match.keys(), player=player)
-        )
-        for lu in lineups:
-            if lu.match_id in per_match and lu.is_starting:
-                per_match[lu.match_id]['is_starting'] = True
+        for field in ('goals', 'assists', 'yellow', 'red'):
+            per_match[key][field] += row[field]
+
+    total_goals = sum(r['goals'] for r in per_match_rows)
+    total_assists = sum(r['assists'] for r in per_match_rows)
+    total_yellow = sum(r['yellow'] for r in per_match_rows)
+    total_red = sum(r['red'] for r in per_match_rows)
 
     matches_stats = list(per_match.values())
     matches_stats.sort(key=lambda r: r['match'].date)
@@ -809,10 +899,9 @@ def player_create(request):
         if form.is_valid():
             player = form.save()
             team_id = request.POST.get('team_id')
-            if team_id:
-                team = Team.objects.filter(pk=team_id).first()
-                if team and not TeamPlayer.objects.filter(player=player).exists():
-                    TeamPlayer.objects.create(team=team, player=player)
+            # у только что созданного игрока команды быть не может — проверяем лишь саму команду
+            if team_id and Team.objects.filter(pk=team_id).exists():
+                TeamPlayer.objects.create(team_id=team_id, player=player)
             return redirect('player_detail', player_id=player.id)
     else:
         form = PlayerForm()
@@ -820,7 +909,7 @@ def player_create(request):
     context = {
         'header_matches': header_matches,
         'form': form,
-        'teams': Team.objects.order_by('name'),
+        'teams': get_teams_for_choice(),
     }
     return render(request, 'player_create.html', context)
 
@@ -844,22 +933,28 @@ def player_edit(request, player_id):
         elif 'save_team' in request.POST:
             new_team_id = request.POST.get('new_team_id')
 
-            TeamPlayer.objects.filter(player=player).delete()
-
-            if new_team_id:
-                TeamPlayer.objects.create(
-                    player=player,
-                    team_id=new_team_id
-                )
+            with transaction.atomic():
+                # блокируем строку игрока: параллельные смены команды идут по очереди
+                # и не создают игроку вторую запись в составе
+                Player.objects.select_for_update().only('id').get(pk=player.pk)
+
+                if new_team_id:
+                    # игрок может числиться в нескольких командах — оставляем только выбранную
+                    TeamPlayer.objects.filter(player=player).exclude(team_id=new_team_id).delete()
+                    TeamPlayer.objects.update_or_create(
+                        player=player,
+                        team_id=new_team_id,
+                        defaults={'number': None},
+                    )
+                else:
+                    TeamPlayer.objects.filter(player=player).delete()
 
             return redirect('player_edit', player_id=player.id)
 
     else:
         form = PlayerForm(instance=player)
 
-    tp = TeamPlayer.objects.filter(player=player).select_related('team').first()
-    current_team = tp.team if tp else None
-    available_teams = Team.objects.order_by('name')
+    available_teams = get_teams_for_choice()
 
     return render(request, 'player_edit.html', {
         'header_matches': header_matches,
@@ -900,9 +995,7 @@ def match_list(request):
     matches = list(matches_qs)
 
     for m in matches:
-        if m.status in ['завершён', 'идёт']:
-            m.home_goals, m.away_goals = get_match_score(m)
-        else:
+        if m.status not in SCORED_STATUSES:
             m.home_goals = None
             m.away_goals = None
 
@@ -914,177 +1007,167 @@ def match_list(request):
 
 def match_detail(request, match_id):
     header_matches = get_header_matches()
-    match = get_object_or_404(Match, pk=match_id)
+    match = get_object_or_404(
+        Match.objects
+        .select_related('home_team', 'away_team')
+        .prefetch_related(
+            Prefetch(
+                'events',
+                queryset=(
+                    MatchEvent.objects
+                    .select_related('player')
+                    .only(
+                        'match', 'team', 'event_type', 'minute', 'added_time',
+                        'player__first_name', 'player__last_name',
+                    )
+                    .order_by('minute', 'added_time', 'id')
+                ),
+            ),
+            Prefetch(
+                'lineups',
+                queryset=(
+                    MatchLineup.objects
+                    .select_related('player')
+                    .only(
+                        'match', 'team', 'is_starting',
+                        'player__first_name', 'player__last_name', 'player__position',
+                    )
+                ),
+            ),
+        ),
+        pk=match_id,
+    )
 
     scoring_types = ['гол', 'пенальти_гол']
     own_goal_type = 'автогол'
 
-    # --- СЧЁТ С УЧЁТОМ АВТОГОЛОВ ---
-    home_goals, away_goals = get_match_score(match)
-
-    events = (
-        MatchEvent.objects
-        .filter(match=match)
-        .select_related('team', 'player')
-        .order_by('minute', 'added_time', 'id')
-    )
-
-    home_lineups = (
-        MatchLineup.objects
-        .filter(match=match, team=match.home_team)
-        .select_related('player')
-    )
-    away_lineups = (
-        MatchLineup.objects
-        .filter(match=match, team=match.away_team)
-        .select_related('player')
-    )
-
-    lineup_player_ids = [lu.player_id for lu in home_lineups] + [lu.player_id for lu in away_lineups]
+    # --- СЧЁТ С УЧЁТОМ АВТОГОЛОВ (хранится в матче) ---
+    home_goals, away_goals = match.home_goals, match.away_goals
+
+    # события делим по командам за один проход
+    home_events = []
+    away_events = []
+    for e in match.events.all():
+        if e.team_id == match.home_team_id:
+            home_events.append(e)
+        if e.team_id == match.away_team_id:
+            away_events.append(e)
+
+    # составы обеих команд пришли одним запросом, делим по команде в Python
+    lineups = list(match.lineups.all())
+    home_lineups = [lu for lu in lineups if lu.team_id == match.home_team_id]
+    away_lineups = [lu for lu in lineups if lu.team_id == match.away_team_id]
+
+    number_map = {
+        (player_id, team_id): number
+        for team_id, player_id, number in (
+            TeamPlayer.objects
+            .filter(
+                team_id__in=[match.home_team_id, match.away_team_id],
+                player_id__in=[lu.player_id for lu in lineups],
+            )
+            .values_list('team_id', 'player_id', 'number')
+        )
+    }
 
-    tp_qs = TeamPlayer.objects.filter(
-        team__in=[match.home_team, match.away_team],
-        player_id__in=lineup_player_ids
-    )
+    stats_map = {
+        (row['player_id'], row['team_id']): row
+        for row in (
+            MatchEvent.objects
+            .filter(match=match, player__isnull=False)
+            .values('player_id', 'team_id')
+            .annotate(
+                goals=Count('id', filter=Q(event_type__in=scoring_types)),
+                assists=Count('id', filter=Q(event_type='ассист')),
+                yellow=Count('id', filter=Q(event_type='желтая')),
+                red=Count('id', filter=Q(event_type='красная')),
+            )
+            .order_by()
+        )
+    }
 
-    number_map = {}
-    for tp in tp_qs:
-        number_map[(tp.team_id, tp.player_id)] = tp.number
-
-    stats_map = {}
-    for e in events:
-        if not e.player_id or not e.team_id:
-            continue
-        key = (e.player_id, e.team_id)
-        if key not in stats_map:
-            stats_map[key] = {
-                'goals': 0,
-                'assists': 0,
-                'yellow': 0,
-                'red': 0,
-            }
-        s = stats_map[key]
-        if e.event_type in scoring_types:
-            s['goals'] += 1
-        elif e.event_type == 'ассист':
-            s['assists'] += 1
-        elif e.event_type == 'желтая':
-            s['yellow'] += 1
-        elif e.event_type == 'красная':
-            s['red'] += 1
-
-    def build_team_events(team):
-        team_events = [e for e in events if e.team_id == team.id]
+    def build_team_events(team_events):
         display = []
-        used_ids = set()
 
         sub_out_ids = set()
         sub_in_ids = set()
 
-        i = 0
-        while i < len(team_events):
-            e = team_events[i]
-            if e.id in used_ids:
-                i += 1
-                continue
-
-            et = e.event_type
-
-            if et in ['гол', 'пенальти_гол']:
-                assist_ev = None
-                for j in range(i + 1, len(team_events)):
-                    ae = team_events[j]
-                    if ae.id in used_ids:
-                        continue
-                    if (ae.event_type == 'ассист' and
-                            ae.minute == e.minute and
-                            ae.added_time == e.added_time):
-                        assist_ev = ae
-                        used_ids.add(ae.id)
-                        break
+        # события отсортированы по (минута, добавленное время, id), поэтому
+        # всё, что связывается между собой (гол + ассист, две записи замены),
+        # лежит в одной группе момента
+        for _, group in groupby(team_events, key=lambda ev: (ev.minute, ev.added_time)):
+            group = list(group)
+            assists = deque(
+                (k, ev) for k, ev in enumerate(group) if ev.event_type == 'ассист'
+            )
 
-                display.append({
-                    'kind': 'goal',
-                    'minute': e.minute,
-                    'added': e.added_time,
-                    'player': e.player,
-                    'is_penalty': (et == 'пенальти_гол'),
-                    'assist': assist_ev.player if assist_ev and assist_ev.player_id else None,
-                })
-                used_ids.add(e.id)
-                i += 1
-                continue
-
-            if et == 'автогол':
-                display.append({
-                    'kind': 'own_goal',
-                    'minute': e.minute,
-                    'added': e.added_time,
-                    'player': e.player,
-                })
-                used_ids.add(e.id)
-                i += 1
-                continue
-
-            if et in ['желтая', 'красная']:
-                display.append({
-                    'kind': 'card',
-                    'minute': e.minute,
-                    'added': e.added_time,
-                    'player': e.player,
-                    'card': 'yellow' if et == 'желтая' else 'red',
-                })
-                used_ids.add(e.id)
-                i += 1
-                continue
-
-            if et == 'замена':
-                out_ev = e
-                in_ev = None
-                if i + 1 < len(team_events):
-                    cand = team_events[i + 1]
-                    if (cand.event_type == 'замена' and
-                            cand.minute == e.minute and
-                            cand.added_time == e.added_time):
-                        in_ev = cand
-                        used_ids.add(cand.id)
-                        i += 1
-
-                display.append({
-                    'kind': 'sub',
-                    'minute': e.minute,
-                    'added': e.added_time,
-                    'player_out': out_ev.player,
-                    'player_in': in_ev.player if in_ev else None,
-                })
-
-                if out_ev.player_id:
-                    sub_out_ids.add(out_ev.player_id)
-                if in_ev and in_ev.player_id:
-                    sub_in_ids.add(in_ev.player_id)
-
-                used_ids.add(out_ev.id)
-                i += 1
-                continue
-
-            i += 1
+            k = 0
+            while k < len(group):
+                e = group[k]
+                et = e.event_type
+
+                if et in ['гол', 'пенальти_гол']:
+                    # гол забирает первый ещё не взятый ассист после себя
+                    while assists and assists[0][0] < k:
+                        assists.popleft()
+                    assist_ev = assists.popleft()[1] if assists else None
+
+                    display.append({
+                        'kind': 'goal',
+                        'minute': e.minute,
+                        'added': e.added_time,
+                        'player': e.player,
+                        'is_penalty': (et == 'пенальти_гол'),
+                        'assist': assist_ev.player if assist_ev and assist_ev.player_id else None,
+                    })
+
+                elif et == 'автогол':
+                    display.append({
+                        'kind': 'own_goal',
+                        'minute': e.minute,
+                        'added': e.added_time,
+                        'player': e.player,
+                    })
+
+                elif et in ['желтая', 'красная']:
+                    display.append({
+                        'kind': 'card',
+                        'minute': e.minute,
+                        'added': e.added_time,
+                        'player': e.player,
+                        'card': 'yellow' if et == 'желтая' else 'red',
+                    })
+
+                elif et == 'замена':
+                    # уходящий и выходящий — две подряд идущие записи замены
+                    out_ev = e
+                    in_ev = None
+                    if k + 1 < len(group) and group[k + 1].event_type == 'замена':
+                        in_ev = group[k + 1]
+                        k += 1
+
+                    display.append({
+                        'kind': 'sub',
+                        'minute': e.minute,
+                        'added': e.added_time,
+                        'player_out': out_ev.player,
+                        'player_in': in_ev.player if in_ev else None,
+                    })
+
+                    if out_ev.player_id:
+                        sub_out_ids.add(out_ev.player_id)
+                    if in_ev and in_ev.player_id:
+                        sub_in_ids.add(in_ev.player_id)
+
+                k += 1
 
         return display, sub_out_ids, sub_in_ids
 
-    home_events_display, home_sub_out_ids, home_sub_in_ids = build_team_events(match.home_team)
-    away_events_display, away_sub_out_ids, away_sub_in_ids = build_team_events(match.away_team)
+    home_events_display, home_sub_out_ids, home_sub_in_ids = build_team_events(home_events)
+    away_events_display, away_sub_out_ids, away_sub_in_ids = build_team_events(away_events)
 
     def position_rank(player):
-        code = (player.position or '').upper()
-        if code in ('ВРТ'):
-            return 1
-        if code in ('ЗАЩ'):
-            return 2
-        if code in ('ПЗ'):
-            return 3
-        if code in ('НАП'):
-            return 4
-        return 5
+        return POSITION_RANK.get((player.position or '').upper(), 5)
 
     def build_squad(lineups, team, sub_out_ids, sub_in_ids):
         squad = []
@@ -1161,21 +1244,10 @@ def match_create(request):
     if request.method == 'POST':
         form = MatchForm(request.POST)
         if form.is_valid():
-            match = form.save()
-
-            def to_ids(name):
-                ids = set()
-                for val in request.POST.getlist(name):
-                    try:
-                        ids.add(int(val))
-                    except ValueError:
-                        pass
-                return ids
-
-            home_ids = to_ids('home_players')
-            away_ids = to_ids('away_players')
-            home_start_ids = to_ids('home_starters')
-            away_start_ids = to_ids('away_starters')
+            home_ids = get_post_ids(request, 'home_players')
+            away_ids = get_post_ids(request, 'away_players')
+            home_start_ids = get_post_ids(request, 'home_starters')
+            away_start_ids = get_post_ids(request, 'away_starters')
 
             home_team = form.cleaned_data['home_team']
             away_team = form.cleaned_data['away_team']
@@ -1194,27 +1266,27 @@ def match_create(request):
             home_start_ids = limit_starters(home_start_ids, home_team)
             away_start_ids = limit_starters(away_start_ids, away_team)
 
-            selected_ids = home_ids | away_ids
-            for pid in selected_ids:
+            with transaction.atomic():
+                match = form.save()
 
-                if pid in home_ids:
-                    team_for_player = home_team
-                elif pid in away_ids:
-                    team_for_player = away_team
-                else:
-                    continue
-
-                is_starting = (
-                    (team_for_player == home_team and pid in home_start_ids) or
-                    (team_for_player == away_team and pid in away_start_ids)
-                )
-
-                MatchLineup.objects.create(
-                    match=match,
-                    team=team_for_player,
-                    player_id=pid,
-                    is_starting=is_starting,
-                )
+                # вся заявка — одним INSERT
+                lineups = []
+                for pid in home_ids | away_ids:
+                    if pid in home_ids:
+                        lineups.append(MatchLineup(
+                            match=match,
+                            team=home_team,
+                            player_id=pid,
+                            is_starting=pid in home_start_ids,
+                        ))
+                    else:
+                        lineups.append(MatchLineup(
+                            match=match,
+                            team=away_team,
+                            player_id=pid,
+                            is_starting=pid in away_start_ids,
+                        ))
+                MatchLineup.objects.bulk_create(lineups, batch_size=100)
 
             return redirect('match_detail', match_id=match.id)
 
@@ -1235,17 +1307,22 @@ def match_edit(request, match_id):
     - составы (заявка/старт), старт <= 11
     """
     header_matches = get_header_matches()
-    match = get_object_or_404(Match, pk=match_id)
+    match = get_object_or_404(
+        Match.objects.select_related('home_team', 'away_team'),
+        pk=match_id,
+    )
 
     home_team_players_qs = (
         TeamPlayer.objects
         .filter(team=match.home_team)
-        .select_related('player', 'team')
+        .select_related('player')
+        .only('team', 'number', 'player__first_name', 'player__last_name', 'player__position')
     )
     away_team_players_qs = (
         TeamPlayer.objects
         .filter(team=match.away_team)
-        .select_related('player', 'team')
+        .select_related('player')
+        .only('team', 'number', 'player__first_name', 'player__last_name', 'player__position')
     )
 
     home_team_players = sort_team_players_by_position(home_team_players_qs)
@@ -1274,19 +1351,10 @@ def match_edit(request, match_id):
         elif 'save_lineups' in request.POST:
             form = MatchForm(instance=match)
 
-            def to_int_set(name):
-                out = set()
-                for v in request.POST.getlist(name):
-                    try:
-                        out.add(int(v))
-                    except ValueError:
-                        pass
-                return out
-
-            home_ids = to_int_set('home_players')
-            away_ids = to_int_set('away_players')
-            home_start_ids = to_int_set('home_starters')
-            away_start_ids = to_int_set('away_starters')
+            home_ids = get_post_ids(request, 'home_players')
+            away_ids = get_post_ids(request, 'away_players')
+            home_start_ids = get_post_ids(request, 'home_starters')
+            away_start_ids = get_post_ids(request, 'away_starters')
 
             valid_home_starters = set()
             for tp in home_team_players:
@@ -1307,43 +1375,61 @@ def match_edit(request, match_id):
             selected_ids = home_ids | away_ids
             starter_ids = home_start_ids | away_start_ids
 
-            existing_lineups = list(MatchLineup.objects.filter(match=match))
-            existing_by_player = {lu.player_id: lu for lu in existing_lineups}
-
-            for lu in existing_lineups:
-                if lu.player_id not in selected_ids:
-                    lu.delete()
+            with transaction.atomic():
+                existing_lineups = list(
+                    MatchLineup.objects
+                    .select_for_update()
+                    .filter(match=match)
+                )
+                existing_by_player = {lu.player_id: lu for lu in existing_lineups}
+
+                removed_ids = [
+                    lu.player_id for lu in existing_lineups
+                    if lu.player_id not in selected_ids
+                ]
+                if removed_ids:
+                    MatchLineup.objects.filter(match=match, player_id__in=removed_ids).delete()
+
+                to_create = []
+                to_update = []
+                for pid in selected_ids:
+                    team_for_player = player_team_map.get(pid)
+                    if not team_for_player:
+                        continue
 
-            for pid in selected_ids:
-                team_for_player = player_team_map.get(pid)
-                if not team_for_player:
-                    continue
+                    is_starting = pid in starter_ids
 
-                is_starting = pid in starter_ids
-                pos_value = player_position_map.get(pid) or ''
+                    if pid in existing_by_player:
+                        lu = existing_by_player[pid]
+                        if lu.team_id != team_for_player.id or lu.is_starting != is_starting:
+                            lu.team = team_for_player
+                            lu.is_starting = is_starting
+                            to_update.append(lu)
+                    else:
+                        to_create.append(MatchLineup(
+                            match=match,
+                            team=team_for_player,
+                            player_id=pid,
+                            is_starting=is_starting,
+                            position=player_position_map.get(pid) or '',
+                        ))
 
-                if pid in existing_by_player:
-                    lu = existing_by_player[pid]
-                    lu.team = team_for_player
-                    lu.is_starting = is_starting
-                    lu.save()
-                else:
-                    # ✅ вместо raw SQL — ORM, логика та же
-                    MatchLineup.objects.create(
-                        match=match,
-                        team=team_for_player,
-                        player_id=pid,
-                        is_starting=is_starting,
-                        position=pos_value  # если поле есть — сохранит, если blank=True — ок
-                    )
+                if to_update:
+                    MatchLineup.objects.bulk_update(to_update, ['team', 'is_starting'], batch_size=100)
+                if to_create:
+                    MatchLineup.objects.bulk_create(to_create, batch_size=100)
 
             return redirect('match_edit', match_id=match.id)
 
     form = MatchForm(instance=match)
 
-    lineups = list(MatchLineup.objects.filter(match=match))
-    lineup_player_ids = {lu.player_id for lu in lineups}
-    starting_player_ids = {lu.player_id for lu in lineups if lu.is_starting}
+    lineups = list(
+        MatchLineup.objects
+        .filter(match=match)
+        .values_list('player_id', 'is_starting')
+    )
+    lineup_player_ids = {player_id for player_id, _ in lineups}
+    starting_player_ids = {player_id for player_id, is_starting in lineups if is_starting}
 
     context = {
         'header_matches': header_matches,
@@ -1363,18 +1449,23 @@ def match_events_edit(request, match_id):
     (логика без изменений)
     """
     header_matches = get_header_matches()
-    match = get_object_or_404(Match, pk=match_id)
+    match = get_object_or_404(
+        Match.objects.select_related('home_team', 'away_team'),
+        pk=match_id,
+    )
 
     home_lineups = (
         MatchLineup.objects
         .filter(match=match, team=match.home_team)
         .select_related('player')
+        .only('is_starting', 'player__first_name', 'player__last_name', 'player__position')
         .order_by('player__last_name', 'player__first_name')
     )
     away_lineups = (
         MatchLineup.objects
         .filter(match=match, team=match.away_team)
         .select_related('player')
+        .only('is_starting', 'player__first_name', 'player__last_name', 'player__position')
         .order_by('player__last_name', 'player__first_name')
     )
 
@@ -1393,27 +1484,38 @@ def match_events_edit(request, match_id):
 
     errors = []
 
-    def get_on_field_player_ids(team, minute, added_time):
-        lineups = MatchLineup.objects.filter(match=match, team=team)
-        starting = {lu.player_id for lu in lineups if lu.is_starting}
-        on_field = set(starting)
+    # старты берём из уже загруженных составов, замены читаем один раз за запрос
+    starting_ids_by_team = {
+        match.home_team_id: {lu.player_id for lu in home_lineups if lu.is_starting},
+        match.away_team_id: {lu.player_id for lu in away_lineups if lu.is_starting},
+    }
+    subs_by_team = None
 
-        subs = (
-            MatchEvent.objects
-            .filter(match=match, team=team, event_type='замена')
-            .order_by('minute', 'added_time', 'id')
-        )
+    def get_on_field_player_ids(team, minute, added_time):
+        nonlocal subs_by_team
+        if subs_by_team is None:
+            subs_by_team = defaultdict(list)
+            for e in (
+                MatchEvent.objects
+                .filter(match=match, event_type='замена')
+                .order_by('minute', 'added_time', 'id')
+                .values('team_id', 'player_id', 'minute', 'added_time')
+            ):
+                subs_by_team[e['team_id']].append(e)
+
+        on_field = set(starting_ids_by_team.get(team.id, ()))
+        subs = subs_by_team.get(team.id, [])
 
         target = (minute or 0, added_time or 0)
 
         def time_key(e):
-            return (e.minute or 0, e.added_time or 0)
+            return (e['minute'] or 0, e['added_time'] or 0)
 
         for (m, a), group in groupby(subs, key=time_key):
             if (m, a) >= target:
                 break
             group = list(group)
-            players_in_group = [e.player_id for e in group if e.player_id]
+            players_in_group = [e['player_id'] for e in group if e['player_id']]
 
             out_candidates = [pid for pid in players_in_group if pid in on_field]
             in_candidates = [pid for pid in players_in_group if pid not in on_field]
@@ -1427,48 +1529,39 @@ def match_events_edit(request, match_id):
 
     if request.method == 'POST':
         if 'delete_events' in request.POST:
-            ids = request.POST.getlist('event_id')
+            ids = get_post_ids(request, 'event_id')
             if ids:
-                base_qs = MatchEvent.objects.filter(match=match, id__in=ids)
-                to_delete = set(base_qs.values_list('id', flat=True))
-
-                for ev in base_qs:
-                    if ev.team_id is None:
-                        team_filter = {'team__isnull': True}
-                    else:
-                        team_filter = {'team': ev.team}
-
-                    if ev.event_type in ['гол', 'пенальти_гол']:
-                        assist_ids = MatchEvent.objects.filter(
-                            match=match,
-                            event_type='ассист',
-                            minute=ev.minute,
-                            added_time=ev.added_time,
-                            **team_filter
-                        ).values_list('id', flat=True)
-                        to_delete.update(assist_ids)
-
-                    if ev.event_type == 'ассист':
-                        goal_ids = MatchEvent.objects.filter(
-                            match=match,
-                            event_type__in=['гол', 'пенальти_гол'],
-                            minute=ev.minute,
-                            added_time=ev.added_time,
-                            **team_filter
-                        ).values_list('id', flat=True)
-                        to_delete.update(goal_ids)
-
-                    if ev.event_type == 'замена':
-                        sub_ids = MatchEvent.objects.filter(
-                            match=match,
-                            event_type='замена',
-                            minute=ev.minute,
-                            added_time=ev.added_time,
-                            **team_filter
-                        ).values_list('id', flat=True)
-                        to_delete.update(sub_ids)
+                # парные события удаляются вместе с выбранными:
+                # гол ↔ ассист, обе записи замены — в тот же момент той же команды
+                partner_types = {
+                    'гол': ['ассист'],
+                    'пенальти_гол': ['ассист'],
+                    'ассист': ['гол', 'пенальти_гол'],
+                    'замена': ['замена'],
+                }
 
-                MatchEvent.objects.filter(match=match, id__in=to_delete).delete()
+                events_by_moment = defaultdict(list)
+                for ev in (
+                    MatchEvent.objects
+                    .filter(match=match)
+                    .values('id', 'event_type', 'team_id', 'minute', 'added_time')
+                ):
+                    events_by_moment[(ev['team_id'], ev['minute'], ev['added_time'])].append(ev)
+
+                to_delete = set()
+                for moment_events in events_by_moment.values():
+                    for ev in moment_events:
+                        if ev['id'] not in ids:
+                            continue
+                        to_delete.add(ev['id'])
+                        wanted = partner_types.get(ev['event_type'], [])
+                        to_delete.update(
+                            other['id'] for other in moment_events
+                            if other['event_type'] in wanted
+                        )
+
+                if to_delete:
+                    MatchEvent.objects.filter(match=match, id__in=to_delete).delete()
 
             return redirect('match_events_edit', match_id=match.id)
 
@@ -1532,12 +1625,14 @@ def match_events_edit(request, match_id):
                         if assist_id and assist_id not in squad_ids_this:
                             errors.append("Ассистент должен быть в заявке выбранной команды.")
 
-                        on_field = get_on_field_player_ids(team, minute, added_time)
+                        # состав на поле считаем, только если прошли простые проверки
+                        if not errors:
+                            on_field = get_on_field_player_ids(team, minute, added_time)
 
-                        if scorer_id and scorer_id not in on_field:
-                            errors.append("Автор гола должен находиться на поле в момент гола.")
-                        if assist_id and assist_id not in on_field:
-                            errors.append("Ассистент должен находиться на поле в момент гола.")
+                            if scorer_id and scorer_id not in on_field:
+                                errors.append("Автор гола должен находиться на поле в момент гола.")
+                            if assist_id and assist_id not in on_field:
+                                errors.append("Ассистент должен находиться на поле в момент гола.")
 
                         if assist_id and scorer_id and assist_id == scorer_id:
                             errors.append("Ассистент и автор гола не могут быть одним и тем же.")
@@ -1577,10 +1672,11 @@ def match_events_edit(request, match_id):
                         if scorer_id and scorer_id not in squad_ids_this:
                             errors.append("Игрок должен быть в заявке выбранной команды.")
 
-                        on_field = get_on_field_player_ids(team, minute, added_time)
+                        if not errors:
+                            on_field = get_on_field_player_ids(team, minute, added_time)
 
-                        if scorer_id and scorer_id not in on_field:
-                            errors.append("Исполнитель пенальти должен быть на поле в момент удара.")
+                            if scorer_id and scorer_id not in on_field:
+                                errors.append("Исполнитель пенальти должен быть на поле в момент удара.")
 
                         if not errors:
                             MatchEvent.objects.create(
@@ -1608,9 +1704,10 @@ def match_events_edit(request, match_id):
                         if player_id and player_id not in squad_ids_this:
                             errors.append("Игрок автогола должен быть в заявке выбранной команды.")
 
-                        on_field_actual = get_on_field_player_ids(team, minute, added_time)
-                        if player_id and player_id not in on_field_actual:
-                            errors.append("Игрок, забивший автогол, должен быть на поле в этот момент.")
+                        if not errors:
+                            on_field_actual = get_on_field_player_ids(team, minute, added_time)
+                            if player_id and player_id not in on_field_actual:
+                                errors.append("Игрок, забивший автогол, должен быть на поле в этот момент.")
 
                         if not errors:
                             MatchEvent.objects.create(
@@ -1637,10 +1734,11 @@ def match_events_edit(request, match_id):
                         if player_id and player_id not in squad_ids_this:
                             errors.append("Игрок должен быть в заявке выбранной команды.")
 
-                        on_field = get_on_field_player_ids(team, minute, added_time)
+                        if not errors:
+                            on_field = get_on_field_player_ids(team, minute, added_time)
 
-                        if player_id and player_id not in on_field:
-                            errors.append("Карточку может получить только игрок, находящийся на поле.")
+                            if player_id and player_id not in on_field:
+                                errors.append("Карточку может получить только игрок, находящийся на поле.")
 
                         if not errors:
                             event_type = 'желтая' if mode == 'yellow' else 'красная'
@@ -1675,34 +1773,42 @@ def match_events_edit(request, match_id):
                         if player_in_id and player_in_id not in squad_ids_this:
                             errors.append("Игрок, который выходит, должен быть в заявке выбранной команды.")
 
-                        on_field = get_on_field_player_ids(team, minute, added_time)
+                        if not errors:
+                            on_field = get_on_field_player_ids(team, minute, added_time)
 
-                        if player_out_id and player_out_id not in on_field:
-                            errors.append("Игрок, который уходит, должен находиться на поле в момент замены.")
+                            if player_out_id and player_out_id not in on_field:
+                                errors.append("Игрок, который уходит, должен находиться на поле в момент замены.")
 
-                        if player_in_id and player_in_id in on_field:
-                            errors.append("Игрок, который выходит, не должен уже находиться на поле.")
+                            if player_in_id and player_in_id in on_field:
+                                errors.append("Игрок, который выходит, не должен уже находиться на поле.")
 
                         if player_in_id and player_out_id and player_in_id == player_out_id:
                             errors.append("Нельзя заменить игрока самим собой.")
 
                         if not errors:
-                            MatchEvent.objects.create(
-                                match=match,
-                                team=team,
-                                player_id=player_out_id,
-                                event_type='замена',
-                                minute=minute,
-                                added_time=added_time,
-                            )
-                            MatchEvent.objects.create(
-                                match=match,
-                                team=team,
-                                player_id=player_in_id,
-                                event_type='замена',
-                                minute=minute,
-                                added_time=added_time,
-                            )
+                            # уходящий и выходящий — одним INSERT; порядок id сохраняется.
+                            # bulk_create не шлёт post_save, поэтому версию кэша
+                            # поднимаем сами (на счёт замена не влияет) — после коммита
+                            with transaction.atomic():
+                                MatchEvent.objects.bulk_create([
+                                    MatchEvent(
+                                        match=match,
+                                        team=team,
+                                        player_id=player_out_id,
+                                        event_type='замена',
+                                        minute=minute,
+                                        added_time=added_time,
+                                    ),
+                                    MatchEvent(
+                                        match=match,
+                                        team=team,
+                                        player_id=player_in_id,
+                                        event_type='замена',
+                                        minute=minute,
+                                        added_time=added_time,
+                                    ),
+                                ])
+                                transaction.on_commit(bump_matches_version)
                             return redirect('match_events_edit', match_id=match.id)
 
                     else:
@@ -1723,7 +1829,10 @@ def match_events_edit(request, match_id):
 
 def match_delete(request, match_id):
     header_matches = get_header_matches()
-    match = get_object_or_404(Match, pk=match_id)
+    match = get_object_or_404(
+        Match.objects.select_related('home_team', 'away_team'),
+        pk=match_id,
+    )
 
     if request.method == 'POST':
         match.delete()
@@ -1746,56 +1855,60 @@ def stats_view(request):
     team_param = request.GET.get('team', '').strip()
     position_param = request.GET.get('position', '').strip()
 
-    scoring_types = ['гол', 'пенальти_гол']
-
-    players = Player.objects.all()
+    players = Player.objects.only('first_name', 'last_name', 'position')
 
     if position_param:
         players = players.filter(position=position_param)
 
-    team_filter = None
-    if team_param.isdigit():
-        team_filter = int(team_param)
-        players = players.filter(team_players__team_id=team_filter)
+    team_filter = int_or_none(team_param)
+    if team_filter is not None:
+        players = players.filter(
+            Exists(TeamPlayer.objects.filter(player=OuterRef('pk'), team_id=team_filter))
+        )
 
+    # события считаются подзапросами, поэтому в JOIN остаются только составы:
+    # запись состава уникальна по (матч, игрок), и COUNT обходится без DISTINCT
     players = (
         players
         .annotate(
-            goals=Count(
-                'events',
-                filter=Q(events__event_type__in=scoring_types),
-                distinct=True
-            ),
-            assists=Count(
-                'events',
-                filter=Q(events__event_type='ассист'),
-                distinct=True
-            ),
-            yellow_cards=Count(
-                'events',
-                filter=Q(events__event_type='желтая'),
-                distinct=True
-            ),
-            red_cards=Count(
-                'events',
-                filter=Q(events__event_type='красная'),
-                distinct=True
-            ),
-            games=Count('lineups__match', distinct=True),
+            **player_stats_annotations('goals', 'assists', 'yellow_cards', 'red_cards'),
+            games=Count('lineups'),
         )
         .prefetch_related('team_players__team')
         .order_by('last_name', 'first_name')
     )
 
-    teams = Team.objects.order_by('name')
+    teams = get_teams_for_choice()
     positions = Player.POSITION_CHOICES
 
-    def get_top(metric, limit=5):
-        return (
+    def get_tops(limit=5):
+        """
+        Четыре рейтинга обзора из одной выборки: агрегатный запрос выполняется
+        один раз, топы режутся в Python, команды подгружаются только для
+        попавших в топы игроков.
+        """
+        candidates = list(
             players
-            .filter(**{f"{metric}__gt": 0})
-            .order_by(f"-{metric}", "games", "last_name", "first_name")[:limit]
+            .prefetch_related(None)
+            .filter(
+                Q(goals__gt=0) | Q(assists__gt=0) |
+                Q(yellow_cards__gt=0) | Q(red_cards__gt=0)
+            )
+        )
+
+        def top(metric):
+            return heapq.nsmallest(
+                limit,
+                (p for p in candidates if getattr(p, metric) > 0),
+                key=lambda p: (-getattr(p, metric), p.games, p.last_name, p.first_name),
+            )
+
+        tops = [top('goals'), top('assists'), top('yellow_cards'), top('red_cards')]
+        prefetch_related_objects(
+            list({p.id: p for top_list in tops for p in top_list}.values()),
+            'team_players__team',
         )
+        return tops
 
     top_scorers = []
     top_assistants = []
@@ -1807,10 +1920,7 @@ def stats_view(request):
     players_list = []
 
     if tab == 'overview':
-        top_scorers = get_top('goals', 5)
-        top_assistants = get_top('assists', 5)
-        top_yellow = get_top('yellow_cards', 5)
-        top_red = get_top('red_cards', 5)
+        top_scorers, top_assistants, top_yellow, top_red = get_tops()
 
     elif tab == 'goals':
         metric = 'goals'
@@ -1850,10 +1960,7 @@ def stats_view(request):
 
     else:
         tab = 'overview'
-        top_scorers = get_top('goals', 5)
-        top_assistants = get_top('assists', 5)
-        top_yellow = get_top('yellow_cards', 5)
-        top_red = get_top('red_cards', 5)
+        top_scorers, top_assistants, top_yellow, top_red = get_tops()
 
     context = {
         'header_matches': header_matches,
@@ -1878,16 +1985,61 @@ def stats_view(request):
 
 def table_view(request):
     header_matches = get_header_matches()
-    standings = _calculate_standings()
+    standings, _ = _calculate_standings()
     return render(request, 'table.html', {
         'header_matches': header_matches,
         'standings': standings,
     })
 
 
-def reports_view(request):
-    header_matches = get_header_matches()
+class _Echo:
+    """Псевдо-буфер для csv.writer: writerow() сразу возвращает готовую строку."""
+
+    def write(self, value):
+        return value
+
+
+def report_writer():
+    """csv.writer для отчётов: TSV, поля с табуляцией или кавычками берутся в кавычки."""
+    return csv.writer(_Echo(), delimiter='\t', lineterminator='\n')
 
+
+def report_response(lines, fmt, filename):
+    """
+    Отчёт отдаётся потоком: строки кодируются и уходят клиенту по одной.
+    excel — TSV в cp1251 (.xls), иначе — текст в UTF-8 (.txt).
+    """
+    if fmt == 'excel':
+        response = StreamingHttpResponse(
+            (line.encode('cp1251', errors='replace') for line in lines),
+            content_type='application/vnd.ms-excel; charset=windows-1251'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xls"'
+    else:
+        response = StreamingHttpResponse(
+            (line.encode('utf-8') for line in lines),
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.txt"'
+    return response
+
+
+def _render_reports_form(request, kind, fmt, team_id, position, match_team_id, match_status):
+    """Страница с формой отчётов: шапка и список команд нужны только ей, не выгрузке."""
+    return render(request, 'reports.html', {
+        'header_matches': get_header_matches(),
+        'teams': get_teams_for_choice(),
+        'positions': Player.POSITION_CHOICES,
+        'kind': kind,
+        'fmt': fmt,
+        'team_id': team_id,
+        'position': position,
+        'match_team_id': match_team_id,
+        'match_status': match_status,
+    })
+
+
+def reports_view(request):
     kind = request.GET.get('kind', '')
     fmt = request.GET.get('format', '')
     team_id = request.GET.get('team') or ''
@@ -1898,177 +2050,116 @@ def reports_view(request):
 
     download = request.GET.get('download')
 
-    teams = Team.objects.order_by('name')
-    positions = Player.POSITION_CHOICES
-
     if not download or kind not in ['players', 'teams', 'matches'] or fmt not in ['excel', 'txt']:
-        return render(request, 'reports.html', {
-            'header_matches': header_matches,
-            'teams': teams,
-            'positions': positions,
-            'kind': kind,
-            'fmt': fmt,
-            'team_id': team_id,
-            'position': position,
-            'match_team_id': match_team_id,
-            'match_status': match_status,
-        })
+        return _render_reports_form(
+            request, kind, fmt, team_id, position, match_team_id, match_status
+        )
 
     if kind == 'players':
         players = Player.objects.all()
 
-        if team_id:
-            players = players.filter(team_players__team_id=team_id)
+        team_filter = int_or_none(team_id)
+        if team_filter is not None:
+            players = players.filter(
+                Exists(TeamPlayer.objects.filter(player=OuterRef('pk'), team_id=team_filter))
+            )
 
         if position:
             players = players.filter(position=position)
 
-        scoring_types = ['гол', 'пенальти_гол']
+        # все колонки отчёта — одним запросом, строки без создания моделей
         players = (
             players
-            .annotate(
-                goals=Count('events', filter=Q(events__event_type__in=scoring_types)),
-                assists=Count('events', filter=Q(events__event_type='ассист')),
-                yellow_cards=Count('events', filter=Q(events__event_type='желтая')),
-                red_cards=Count('events', filter=Q(events__event_type='красная')),
-            )
+            .annotate(**player_stats_annotations(), team_name=main_team_name_subquery())
             .order_by('last_name', 'first_name')
+            .values_list(
+                'last_name', 'first_name', 'position', 'team_name',
+                'matches', 'goals', 'assists', 'yellow_cards', 'red_cards',
+                named=True,
+            )
         )
 
-        tps = (
-            TeamPlayer.objects
-            .filter(player__in=players)
-            .select_related('team')
-        )
-        team_by_player = {}
-        for tp in tps:
-            team_by_player.setdefault(tp.player_id, tp.team)
-
-        matches_qs = (
-            MatchEvent.objects
-            .filter(player__in=players)
-            .values('player_id')
-            .annotate(match_count=Count('match', distinct=True))
-        )
-        matches_map = {row['player_id']: row['match_count'] for row in matches_qs}
-
-        buffer = io.StringIO()
-        buffer.write("Игрок\tКоманда\tПозиция\tМатчи\tГолы\tАссисты\tЖК\tКК\n")
-
-        for p in players:
-            team = team_by_player.get(p.id)
-            team_name = team.name if team else ''
+        def rows():
+            writer = report_writer()
+            yield writer.writerow(
+                ['Игрок', 'Команда', 'Позиция', 'Матчи', 'Голы', 'Ассисты', 'ЖК', 'КК']
+            )
 
-            pos_display = p.position or ''
-            games = matches_map.get(p.id, 0)
+            # выгрузка проходит по всем игрокам один раз — читаем порциями, без кэша queryset
+            for p in players.iterator(chunk_size=2000):
+                yield writer.writerow([
+                    f"{p.last_name} {p.first_name}",
+                    p.team_name or '',
+                    p.position or '',
+                    p.matches, p.goals, p.assists, p.yellow_cards, p.red_cards,
+                ])
 
-            line = f"{p.last_name} {p.first_name}\t{team_name}\t{pos_display}\t{games}\t{p.goals}\t{p.assists}\t{p.yellow_cards}\t{p.red_cards}\n"
-            buffer.write(line)
+        return report_response(rows(), fmt, 'players_report')
 
-        content = buffer.getvalue()
-        buffer.close()
+    if kind == 'teams':
+        standings, _ = _calculate_standings()
 
-        if fmt == 'excel':
-            data = content.encode('cp1251', errors='replace')
-            response = HttpResponse(
-                data,
-                content_type='application/vnd.ms-excel; charset=windows-1251'
+        def rows():
+            writer = report_writer()
+            yield writer.writerow(
+                ['Команда', 'Город', 'И', 'В', 'Н', 'П', 'Забито', 'Пропущено', 'Разница', 'Очки']
             )
-            response['Content-Disposition'] = 'attachment; filename="players_report.xls"'
-            return response
-        else:
-            response = HttpResponse(content, content_type='text/plain; charset=utf-8')
-            response['Content-Disposition'] = 'attachment; filename="players_report.txt"'
-            return response
 
-    if kind == 'teams':
-        standings = _calculate_standings()
-
-        buffer = io.StringIO()
-        buffer.write("Команда\tГород\tИ\tВ\tН\tП\tЗабито\tПропущено\tРазница\tОчки\n")
-
-        for row in standings:
-            team = row['team']
-            diff = row['goals_for'] - row['goals_against']
-            city = team.city or ''
-            line = (
-                f"{team.name}\t"
-                f"{city}\t"
-                f"{row['games']}\t{row['wins']}\t{row['draws']}\t{row['losses']}\t"
-                f"{row['goals_for']}\t{row['goals_against']}\t{diff}\t{row['points']}\n"
-            )
-            buffer.write(line)
+            for row in standings:
+                team = row['team']
+                yield writer.writerow([
+                    team.name,
+                    team.city or '',
+                    row['games'], row['wins'], row['draws'], row['losses'],
+                    row['goals_for'], row['goals_against'],
+                    row['goals_for'] - row['goals_against'],
+                    row['points'],
+                ])
 
-        content = buffer.getvalue()
-        buffer.close()
-
-        if fmt == 'excel':
-            data = content.encode('cp1251', errors='replace')
-            response = HttpResponse(
-                data,
-                content_type='application/vnd.ms-excel; charset=windows-1251'
-            )
-            response['Content-Disposition'] = 'attachment; filename="teams_table.xls"'
-            return response
-        else:
-            response = HttpResponse(content, content_type='text/plain; charset=utf-8')
-            response['Content-Disposition'] = 'attachment; filename="teams_table.txt"'
-            return response
+        return report_response(rows(), fmt, 'teams_table')
 
     if kind == 'matches':
-        matches = (
-            Match.objects
-            .select_related('home_team', 'away_team')
-        )
+        matches = Match.objects.all()
 
-        if match_team_id:
+        match_team_filter = int_or_none(match_team_id)
+        if match_team_filter is not None:
             matches = matches.filter(
-                Q(home_team_id=match_team_id) | Q(away_team_id=match_team_id)
+                Q(home_team_id=match_team_filter) | Q(away_team_id=match_team_filter)
             )
 
         if match_status:
             matches = matches.filter(status=match_status)
 
-        matches = matches.order_by('date')
-
-        buffer = io.StringIO()
-        buffer.write("Дата/время\tХозяева\tГости\tСчёт\tСтатус\n")
+        matches = (
+            matches
+            .order_by('date')
+            .values_list(
+                'date', 'status', 'home_goals', 'away_goals',
+                'home_team__name', 'away_team__name',
+                named=True,
+            )
+        )
 
-        for m in matches:
-            if m.status in ['завершён', 'идёт']:
-                hg, ag = get_match_score(m)
-                score_str = f"{hg}:{ag}"
-            else:
-                score_str = "-:-"
+        def rows():
+            writer = report_writer()
+            yield writer.writerow(['Дата/время', 'Хозяева', 'Гости', 'Счёт', 'Статус'])
 
-            date_str = m.date.strftime('%d.%m.%Y %H:%M')
-            line = f"{date_str}\t{m.home_team.name}\t{m.away_team.name}\t{score_str}\t{m.get_status_display()}\n"
-            buffer.write(line)
+            for m in matches.iterator(chunk_size=2000):
+                if m.status in SCORED_STATUSES:
+                    score_str = f"{m.home_goals}:{m.away_goals}"
+                else:
+                    score_str = "-:-"
 
-        content = buffer.getvalue()
-        buffer.close()
+                yield writer.writerow([
+                    m.date.strftime('%d.%m.%Y %H:%M'),
+                    m.home_team__name,
+                    m.away_team__name,
+                    score_str,
+                    MATCH_STATUS_DISPLAY.get(m.status, m.status),
+                ])
 
-        if fmt == 'excel':
-            data = content.encode('cp1251', errors='replace')
-            response = HttpResponse(
-                data,
-                content_type='application/vnd.ms-excel; charset=windows-1251'
-            )
-            response['Content-Disposition'] = 'attachment; filename="matches_report.xls"'
-            return response
-        else:
-            response = HttpResponse(content, content_type='text/plain; charset=utf-8')
-            response['Content-Disposition'] = 'attachment; filename="matches_report.txt"'
-            return response
+        return report_response(rows(), fmt, 'matches_report')
 
-    return render(request, 'reports.html', {
-        'header_matches': header_matches,
-        'teams': teams,
-        'positions': positions,
-        'kind': kind,
-        'fmt': fmt,
-        'team_id': team_id,
-        'position': position,
-        'match_team_id': match_team_id,
-        'match_status': match_status,
-    })
+    return _render_reports_form(
+        request, kind, fmt, team_id, position, match_team_id, match_status
+    )
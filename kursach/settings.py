@@ -100,6 +100,24 @@ DATABASES = {
         "PASSWORD": os.getenv("PGPASSWORD", ""),
         "HOST": os.getenv("PGHOST", "localhost"),
         "PORT": os.getenv("PGPORT", "5432"),
+        # держим соединение между запросами вместо нового подключения на каждый;
+        # перед повторным использованием Django проверяет, что оно живо
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+
+# -------------------------
+# Cache
+# -------------------------
+# Кэш общий для всех воркеров gunicorn (таблица в той же базе,
+# создаётся командой createcachetable): сброс версии после записи
+# виден сразу во всех процессах, а не только в том, что обработал запрос.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
     }
 }
 
@@ -137,8 +155,21 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Но если хочешь явно (не обязательно), можно раскомментировать:
 # STATICFILES_DIRS = [BASE_DIR / "football" / "static"]
 
-# Whitenoise: хранить статику с хэшами (норм для прода)
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Whitenoise: в проде статика с хэшами и сжатием (нужен collectstatic),
+# локально (DEBUG) — обычное хранилище без манифеста.
+# STATICFILES_STORAGE в Django 5.x больше не читается, только STORAGES.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
 
 
 # -------------------------